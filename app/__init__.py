@@ -1,6 +1,7 @@
 from flask import Flask
-from pymongo import MongoClient
 import os
+import time
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,10 +10,50 @@ def create_app():
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev_secret")
 
-    # MongoDB setup
-    mongo_uri = os.environ.get("MONGO_URI")
-    client = MongoClient(mongo_uri)
-    app.db = client.get_default_database()
+    # MongoDB setup: the shared client is created lazily in each worker
+    from .database import db
+    app.db = db
+
+    # Index builds are idempotent; keep them off the boot path
+    from .indexes import ensure_indexes
+    threading.Thread(target=ensure_indexes, name="ensure-indexes", daemon=True).start()
+
+    # Review notifications are fanned out by a background worker; set
+    # NOTIFICATION_WORKER=external when running `python worker.py` separately
+    if os.environ.get("NOTIFICATION_WORKER", "inprocess") == "inprocess":
+        from .notifications import start_notification_worker
+        start_notification_worker()
+
+    from flask import request, g
+
+    # gzip/brotli for text responses; after_request hooks run in reverse, so this one runs last
+    from .compression import compress_response
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, request.headers.get("Accept-Encoding"))
+
+    # Per-route latency and status metrics, exposed at /metrics
+    from .metrics import start_request_timing, finish_request
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        start_request_timing()
+
+    @app.after_request
+    def record_request(response):
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        finish_request(request.method, route, response.status_code,
+                       time.perf_counter() - g.request_started, request.path)
+        return response
+
+    # Content-hashed, precompressed static files served from /assets/
+    from .assets import asset_manifest
+    asset_manifest.prepare()
+
+    from .commands import register_commands
+    register_commands(app)
 
     # Register Blueprints
     from .routes import main_routes
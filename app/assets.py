@@ -0,0 +1,122 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+from flask import url_for
+from .compression import compress, negotiate_encoding, ENCODINGS, ENCODING_SUFFIXES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+ASSET_BUILD_DIR = os.environ.get("ASSET_BUILD_DIR", os.path.join(STATIC_DIR, "build"))
+ASSET_URL_BASE = "/assets/"
+ASSET_MAX_AGE = 365 * 24 * 3600
+# Static files the templates reference through asset_url()
+FINGERPRINTED = ("style.css", "main.js", "favicon.ico")
+PRECOMPRESSED_EXTENSIONS = {".css", ".js", ".svg", ".ico"}
+
+# <name>.<12 hex digits of sha256>.<ext>
+_HASHED = re.compile(r"^[A-Za-z0-9_-]+\.[0-9a-f]{12}\.[a-z0-9]+$")
+
+
+def _write_once(path, data):
+    """Atomically create `path`; content-addressed, so an existing file is already right"""
+    if os.path.exists(path):
+        return
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class AssetManifest:
+    """
+    Content-hashed, precompressed copies of the static files.
+
+    build() writes style.<hash>.css etc. plus .br/.gz siblings into the
+    build directory and records logical name -> hashed name. A changed file
+    gets a new URL, so the old one can be cached forever. Every worker may
+    build at startup: outputs are deterministic and written atomically.
+    Files from earlier builds are kept so pages rendered before a deploy
+    still load.
+    """
+
+    def __init__(self, source_dir=STATIC_DIR, build_dir=ASSET_BUILD_DIR, files=FINGERPRINTED):
+        self.source_dir = source_dir
+        self.build_dir = build_dir
+        self.files = files
+        self.manifest = {}
+
+    def build(self):
+        os.makedirs(self.build_dir, exist_ok=True)
+        manifest = {}
+        for name in self.files:
+            with open(os.path.join(self.source_dir, name), "rb") as f:
+                data = f.read()
+            stem, extension = os.path.splitext(name)
+            hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+            path = os.path.join(self.build_dir, hashed)
+            _write_once(path, data)
+            if extension in PRECOMPRESSED_EXTENSIONS:
+                for encoding in ENCODINGS:
+                    if os.path.exists(path + ENCODING_SUFFIXES[encoding]):
+                        continue
+                    compressed = compress(data, encoding, static=True)
+                    # No variant means resolve() serves the original, e.g. for an empty favicon
+                    if len(compressed) < len(data):
+                        _write_once(path + ENCODING_SUFFIXES[encoding], compressed)
+            manifest[name] = hashed
+
+        fd, temp_path = tempfile.mkstemp(dir=self.build_dir, suffix=".part")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, os.path.join(self.build_dir, "manifest.json"))
+        self.manifest = manifest
+        return manifest
+
+    def load(self):
+        """Use a manifest from an earlier build (e.g. `flask build-assets` on a read-only image)"""
+        with open(os.path.join(self.build_dir, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        return self.manifest
+
+    def prepare(self):
+        """Startup: build, else reuse a prebuilt manifest, else fall back to plain /static/ URLs"""
+        try:
+            return self.build()
+        except OSError as e:
+            logger.error(f"Asset build failed, using an existing manifest if there is one: {e}")
+        try:
+            return self.load()
+        except (OSError, ValueError) as e:
+            logger.error(f"No asset manifest, serving unfingerprinted static files: {e}")
+            return {}
+
+    def url(self, name):
+        """Fingerprinted URL of a static file; the plain /static/ URL if it wasn't built"""
+        hashed = self.manifest.get(name)
+        if hashed is None:
+            return url_for("static", filename=name)
+        return ASSET_URL_BASE + hashed
+
+    def resolve(self, filename, accept_encoding):
+        """(path, content encoding or None) of the best variant of a built file; raises KeyError"""
+        if not _HASHED.match(filename):
+            raise KeyError(filename)
+        path = os.path.join(self.build_dir, filename)
+        if not os.path.isfile(path):
+            raise KeyError(filename)
+        available = [encoding for encoding in ENCODINGS if os.path.isfile(path + ENCODING_SUFFIXES[encoding])]
+        encoding = negotiate_encoding(accept_encoding, available)
+        return (path + ENCODING_SUFFIXES[encoding] if encoding else path), encoding
+
+
+asset_manifest = AssetManifest()
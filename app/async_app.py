@@ -0,0 +1,310 @@
+import os
+import time
+import asyncio
+import logging
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+from quart import Quart, Blueprint, jsonify, request, session, current_app, g
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import HTTPException
+from quart.wrappers.response import DataBody
+from pymongo.errors import PyMongoError
+from .database import MONGO_URI, MONGO_DB_NAME, HeartbeatMonitor
+from .tmdb_api import TMDBClient, tmdb_client, TMDB_API_KEY, TMDB_CLIENT_SETTINGS
+from .outbound import AsyncSingleFlight, RateLimitExceeded
+from .cache import AsyncMovieDetailsCache
+from .catalog import MIRROR_QUERY
+from .metrics import observe_tmdb, MongoCommandMetrics, start_request_timing, finish_request
+from .compression import compressible, compress_body
+from .helper_functions import (
+    movie_details_cache, parse_pagination, user_list_page_pipeline, movie_list_page, list_page_etag, movie_etag,
+    DETAIL_FETCH_CONCURRENCY
+)
+from .http_cache import etag_matches, cache_headers, PRIVATE_REVALIDATE, PUBLIC_REVALIDATE
+from .reviews import review_summary, reviews_query, review_page, MOVIE_VERSION_PROJECTION, REVIEW_SORT, REVIEW_PAGE_SIZE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# --------------------- Async serving mode --------------------- #
+# The I/O-bound JSON endpoints are served by async handlers on httpx and
+# motor, so one worker can keep hundreds of requests waiting on the network.
+# Every other route is passed through to the regular Flask app unchanged.
+
+
+class AsyncTMDBClient(TMDBClient):
+    """TMDBClient on httpx.AsyncClient; same retries, rate limit and coalescing"""
+
+    def __init__(self, api_key, bucket=None, **settings):
+        super().__init__(api_key, **settings)
+        if bucket is not None:
+            # Passthrough Flask routes in the same process use tmdb_client: share its
+            # bucket so together they stay within one TMDB rate
+            self.bucket = bucket
+        self.single_flight = AsyncSingleFlight()
+        self._client = None
+
+    async def start(self):
+        connect_timeout, read_timeout = self.timeout
+        self._client = httpx.AsyncClient(
+            base_url=self.BASE_URL,
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def get(self, path, params=None, api_key=None, block=None):
+        query = {"api_key": api_key or self.api_key, "language": "en-US"}
+        query.update(params or {})
+        block = self.block if block is None else block
+        key = (path, tuple(sorted(query.items())))
+        return await self.single_flight.do(key, self._fetch, path, query, block)
+
+    async def _fetch(self, path, query, block):
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            if not await self.bucket.acquire_async(block=block, timeout=self.queue_timeout):
+                raise RateLimitExceeded(f"TMDB outbound rate limit reached for {path}")
+            self.requests_sent += 1
+            started = time.perf_counter()
+            try:
+                response = await self._client.get(path, params=query)
+            except httpx.TransportError as e:
+                observe_tmdb(path, time.perf_counter() - started, type(e).__name__)
+                if last_attempt:
+                    raise
+                logger.warning(f"TMDB request to {path} failed ({e}), retrying")
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            observe_tmdb(path, time.perf_counter() - started, None if response.is_success else str(response.status_code))
+            if response.status_code in self.RETRY_STATUSES and not last_attempt:
+                logger.warning(f"TMDB returned {response.status_code} for {path}, retrying")
+                await asyncio.sleep(self._backoff(attempt, response))
+                continue
+
+            response.raise_for_status()
+            return response.json()
+
+
+# Errors that mean "TMDB couldn't give us this movie"
+TMDB_ERRORS = (httpx.HTTPError, RateLimitExceeded)
+
+async_routes = Blueprint("async_main", __name__)
+
+
+def _resources():
+    return current_app.config["ASYNC_RESOURCES"]
+
+
+async def _movie_summary(movie_id):
+    try:
+        return TMDBClient.map_movie_summary(await _resources().movie_cache.get(movie_id))
+    except TMDB_ERRORS as e:
+        logger.error(f"Error fetching movie {movie_id}: {e}")
+        return None
+
+
+async def _paginated_movies(field):
+    username = session.get("username", "")
+    if not username:
+        return jsonify({"error": "Not logged in"}), 401
+    username = username.lower()
+
+    resources = _resources()
+    offset, limit = parse_pagination(request.args)
+    result = await resources.db.users.aggregate(user_list_page_pipeline(username, field, offset, limit)).to_list(1)
+    movie_ids, total, version = (result[0]["ids"], result[0]["total"], result[0]["version"]) if result else ([], 0, 0)
+    headers = cache_headers(list_page_etag(username, field, version, offset, limit), PRIVATE_REVALIDATE)
+    if etag_matches(request.headers.get("If-None-Match"), headers["ETag"]):
+        return "", 304, headers
+
+    async def fetch(movie_id):
+        async with resources.detail_slots:
+            return await _movie_summary(movie_id)
+
+    details = await asyncio.gather(*(fetch(movie_id) for movie_id in movie_ids))
+    movies = [movie for movie in details if movie]
+    failed_ids = [movie_id for movie_id, movie in zip(movie_ids, details) if not movie]
+    return jsonify(movie_list_page(movies, failed_ids, offset, limit, len(movie_ids), total)), headers
+
+
+@async_routes.route('/get_watchlist', methods=['GET'])
+async def get_watchlist():
+    try:
+        return await _paginated_movies("watch_list")
+    except Exception as e:
+        logger.error(f"Get watchlist error: {e}")
+        return jsonify({"error": "Failed to fetch watchlist"}), 500
+
+
+@async_routes.route('/get_watched', methods=['GET'])
+async def get_watched():
+    try:
+        return await _paginated_movies("watched")
+    except Exception as e:
+        logger.error(f"Get watched error: {e}")
+        return jsonify({"error": "Failed to fetch watched movies"}), 500
+
+
+@async_routes.route('/movie/<int:movie_id>', methods=['GET'])
+async def get_movie_details(movie_id):
+    resources = _resources()
+    try:
+        movie = await resources.db.movies.find_one({"id": movie_id}, MOVIE_VERSION_PROJECTION)
+        headers = cache_headers(movie_etag(movie_id, movie), PUBLIC_REVALIDATE)
+        if etag_matches(request.headers.get("If-None-Match"), headers["ETag"]):
+            return "", 304, headers
+
+        movie_data = await resources.movie_cache.get(movie_id)
+        review_count, reviews, next_cursor = review_summary(movie)
+
+        movie_details = TMDBClient.map_movie_details(movie_data)
+        movie_details["review_count"] = review_count
+        movie_details["reviews"] = reviews
+        movie_details["next_reviews_cursor"] = next_cursor
+        return jsonify(movie_details), headers
+    except TMDB_ERRORS as e:
+        logger.error(f"Error fetching movie details: {e}")
+        return jsonify({"error": "Movie not found"}), 404
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@async_routes.route('/movie/<int:movie_id>/reviews', methods=['GET'])
+async def get_movie_reviews(movie_id):
+    try:
+        _, limit = parse_pagination(request.args, default_limit=REVIEW_PAGE_SIZE)
+        cursor = _resources().db.reviews.find(reviews_query(movie_id, request.args.get("cursor")))
+        page = await cursor.sort(REVIEW_SORT).limit(limit + 1).to_list(limit + 1)
+        return jsonify(review_page(page, limit))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    except Exception as e:
+        logger.error(f"Get reviews error: {e}")
+        return jsonify({"error": "Failed to fetch reviews"}), 500
+
+
+@async_routes.route('/health')
+async def health_check():
+    resources = _resources()
+    status = resources.monitor.status()
+    body = {
+        "status": "healthy" if status["healthy"] else "unhealthy",
+        "mode": "async",
+        "database": status["database"],
+        "movie_cache": resources.movie_cache.stats(),
+        "tmdb": resources.tmdb.stats()
+    }
+    if not status["healthy"]:
+        body["error"] = status.get("error")
+        return jsonify(body), 503
+    return jsonify(body), 200
+
+
+class AsyncResources:
+    """Event-loop bound clients, created at ASGI startup in each worker"""
+
+    async def start(self):
+        self.monitor = HeartbeatMonitor()
+        self.mongo = AsyncIOMotorClient(
+            MONGO_URI,
+            minPoolSize=int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+            maxPoolSize=int(os.environ.get("MONGO_MAX_POOL_SIZE", "50")),
+            serverSelectionTimeoutMS=int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+            tls=os.environ.get("MONGO_TLS", "true").lower() == "true",
+            retryWrites=True,
+            w="majority",
+            event_listeners=[self.monitor, MongoCommandMetrics()]
+        )
+        self.db = self.mongo[MONGO_DB_NAME]
+        self.tmdb = AsyncTMDBClient(TMDB_API_KEY, bucket=tmdb_client.bucket, **TMDB_CLIENT_SETTINGS)
+        await self.tmdb.start()
+        # Share the in-process tier with the sync routes mounted alongside
+        self.movie_cache = AsyncMovieDetailsCache(
+            self.db.movie_details_cache, self.tmdb.get_movie, mirror=self.find_mirrored_movie,
+            local=movie_details_cache.local
+        )
+        self.detail_slots = asyncio.Semaphore(DETAIL_FETCH_CONCURRENCY)
+
+    async def find_mirrored_movie(self, movie_id):
+        try:
+            doc = await self.db.movies.find_one({"id": movie_id, **MIRROR_QUERY}, {"_id": 0, "tmdb": 1})
+        except PyMongoError as e:
+            logger.error(f"Catalog mirror read error: {e}")
+            return None
+        return doc["tmdb"] if doc else None
+
+    async def close(self):
+        await self.tmdb.close()
+        self.mongo.close()
+
+
+class ModeDispatcher:
+    """ASGI app: requests matching an async route go to Quart, everything else to the Flask app"""
+
+    def __init__(self, async_app, sync_app):
+        self.async_app = async_app
+        self.sync_app = WsgiToAsgi(sync_app)
+        self._urls = async_app.url_map.bind("localhost")
+
+    def _is_async(self, scope):
+        try:
+            self._urls.match(scope["path"], method=scope["method"])
+            return True
+        except HTTPException:
+            return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not self._is_async(scope):
+            await self.sync_app(scope, receive, send)
+        else:
+            await self.async_app(scope, receive, send)
+
+
+def create_async_app(sync_app):
+    app = Quart(__name__)
+    # Same secret as the Flask app, so both read the same session cookie
+    app.secret_key = sync_app.secret_key
+    app.register_blueprint(async_routes)
+
+    @app.before_request
+    async def start_timer():
+        g.request_started = time.perf_counter()
+        start_request_timing()
+
+    @app.after_request
+    async def compress(response):
+        """Same negotiation as the Flask app's compress_response"""
+        if isinstance(response.response, DataBody) and compressible(response):
+            body = compress_body(response, await response.get_data(), request.headers.get("Accept-Encoding"))
+            if body is not None:
+                response.set_data(body)
+        return response
+
+    @app.after_request
+    async def record_request(response):
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        finish_request(request.method, route, response.status_code,
+                       time.perf_counter() - g.request_started, request.path)
+        return response
+
+    resources = AsyncResources()
+    app.config["ASYNC_RESOURCES"] = resources
+
+    @app.before_serving
+    async def startup():
+        start = time.monotonic()
+        await resources.start()
+        logger.info(f"Async mode ready in {time.monotonic() - start:.2f}s")
+
+    @app.after_serving
+    async def shutdown():
+        await resources.close()
+
+    return ModeDispatcher(app, sync_app)
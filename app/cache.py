@@ -0,0 +1,274 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pymongo.errors import PyMongoError
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+MOVIE_CACHE_SIZE = int(os.environ.get("MOVIE_CACHE_SIZE", "2048"))
+MOVIE_CACHE_TTL = int(os.environ.get("MOVIE_CACHE_TTL", "21600"))
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache with a per-entry TTL"""
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class MovieDetailsCache:
+    """
+    Read-through cache for raw TMDB movie payloads.
+
+    Lookups go to an in-process TTLCache first, then to the optional
+    `mirror` (the imported TMDB catalog), then to a Mongo collection shared
+    by every worker, and only then to `loader`. Mongo documents carry an
+    `expires_at` date so a TTL index can reap them. Mirror hits are only
+    kept locally; the mirror already is the shared copy.
+    """
+
+    def __init__(self, collection, loader, mirror=None, maxsize=MOVIE_CACHE_SIZE, ttl=MOVIE_CACHE_TTL):
+        self.collection = collection
+        self.loader = loader
+        self.mirror = mirror
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.mirror_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._indexes_ready = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(movie_id):
+        try:
+            return int(movie_id)
+        except (TypeError, ValueError):
+            return str(movie_id)
+
+    def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexes_ready = True
+        except PyMongoError as e:
+            logger.error(f"Movie cache index error: {e}")
+
+    def _get_shared(self, key):
+        try:
+            doc = self.collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+                {"_id": 0, "data": 1, "expires_at": 1}
+            )
+        except PyMongoError as e:
+            logger.error(f"Movie cache read error: {e}")
+            return None, None
+        if not doc:
+            return None, None
+        with self._lock:
+            self.shared_hits += 1
+        remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+        return doc["data"], max(0, min(self.ttl, remaining))
+
+    def _set_shared(self, key, data):
+        self._ensure_indexes()
+        try:
+            self.collection.update_one(
+                {"_id": key},
+                {"$set": {"data": data, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl)}},
+                upsert=True
+            )
+        except PyMongoError as e:
+            logger.error(f"Movie cache write error: {e}")
+
+    def get(self, movie_id):
+        """Return the payload for `movie_id`, loading it on a miss in both tiers"""
+        key = self._key(movie_id)
+        data = self.local.get(key)
+        if data is not None:
+            return data
+
+        data = self.mirror(key) if self.mirror else None
+        if data is not None:
+            with self._lock:
+                self.mirror_hits += 1
+            self.local.set(key, data)
+            return data
+
+        data, ttl = self._get_shared(key)
+        if data is not None:
+            self.local.set(key, data, ttl=ttl)
+            return data
+
+        with self._lock:
+            self.misses += 1
+        data = self.loader(key)
+        if data is not None:
+            self.local.set(key, data)
+            self._set_shared(key, data)
+        return data
+
+    def invalidate(self, movie_id):
+        key = self._key(movie_id)
+        self.local.pop(key)
+        try:
+            self.collection.delete_one({"_id": key})
+        except PyMongoError as e:
+            logger.error(f"Movie cache invalidate error: {e}")
+
+    def stats(self):
+        local = self.local.stats()
+        return {
+            "size": local["size"],
+            "maxsize": local["maxsize"],
+            "hits": local["hits"] + self.mirror_hits + self.shared_hits,
+            "local_hits": local["hits"],
+            "mirror_hits": self.mirror_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": local["evictions"],
+            "expirations": local["expirations"],
+        }
+
+
+class AsyncMovieDetailsCache(MovieDetailsCache):
+    """
+    MovieDetailsCache for the asyncio serving mode: `collection` is a motor
+    collection and `loader` and `mirror` are coroutine functions. Pass the
+    sync cache's `local` tier to share hot entries between both modes in
+    one process.
+    """
+
+    def __init__(self, collection, loader, mirror=None, local=None, maxsize=MOVIE_CACHE_SIZE, ttl=MOVIE_CACHE_TTL):
+        super().__init__(collection, loader, mirror=mirror, maxsize=maxsize, ttl=ttl)
+        if local is not None:
+            self.local = local
+
+    async def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        try:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexes_ready = True
+        except PyMongoError as e:
+            logger.error(f"Movie cache index error: {e}")
+
+    async def _get_shared(self, key):
+        try:
+            doc = await self.collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+                {"_id": 0, "data": 1, "expires_at": 1}
+            )
+        except PyMongoError as e:
+            logger.error(f"Movie cache read error: {e}")
+            return None, None
+        if not doc:
+            return None, None
+        self.shared_hits += 1
+        remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+        return doc["data"], max(0, min(self.ttl, remaining))
+
+    async def _set_shared(self, key, data):
+        await self._ensure_indexes()
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {"data": data, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl)}},
+                upsert=True
+            )
+        except PyMongoError as e:
+            logger.error(f"Movie cache write error: {e}")
+
+    async def get(self, movie_id):
+        key = self._key(movie_id)
+        data = self.local.get(key)
+        if data is not None:
+            return data
+
+        data = await self.mirror(key) if self.mirror else None
+        if data is not None:
+            self.mirror_hits += 1
+            self.local.set(key, data)
+            return data
+
+        data, ttl = await self._get_shared(key)
+        if data is not None:
+            self.local.set(key, data, ttl=ttl)
+            return data
+
+        self.misses += 1
+        data = await self.loader(key)
+        if data is not None:
+            self.local.set(key, data)
+            await self._set_shared(key, data)
+        return data
+
+    async def invalidate(self, movie_id):
+        key = self._key(movie_id)
+        self.local.pop(key)
+        try:
+            await self.collection.delete_one({"_id": key})
+        except PyMongoError as e:
+            logger.error(f"Movie cache invalidate error: {e}")
@@ -0,0 +1,128 @@
+import io
+import os
+import gzip
+import json
+import time
+import logging
+import requests
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from .database import *
+from .tmdb_api import TMDBClient
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+CATALOG_BATCH_SIZE = int(os.environ.get("CATALOG_BATCH_SIZE", "1000"))
+
+# Raw TMDB detail fields kept in the mirror: everything map_movie_summary and
+# map_movie_details read, plus what local search ranks on
+MIRROR_FIELDS = [
+    "id", "title", "original_title", "tagline", "overview", "release_date", "runtime",
+    "vote_average", "vote_count", "popularity", "genres", "poster_path", "backdrop_path", "adult"
+]
+
+MIRROR_QUERY = {"tmdb": {"$exists": True}}
+MIRROR_CHECK_INTERVAL = 300
+
+
+# --------------------- Reading export files --------------------- #
+def open_export(source):
+    """Open a local path or http(s) URL as a text stream, gunzipping `.gz` files on the fly"""
+    if source.startswith(("http://", "https://")):
+        response = requests.get(source, stream=True, timeout=(3.05, 60))
+        response.raise_for_status()
+        raw = response.raw
+        raw.decode_content = True
+        if source.endswith(".gz"):
+            raw = gzip.GzipFile(fileobj=raw)
+    elif source.endswith(".gz"):
+        raw = gzip.open(source, "rb")
+    else:
+        raw = open(source, "rb")
+    return io.TextIOWrapper(raw, encoding="utf-8")
+
+
+def read_json_lines(source):
+    """Yield one decoded object per line without loading the file; bad lines are logged and skipped"""
+    with open_export(source) as lines:
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning(f"{source}:{number}: skipping malformed line")
+
+
+# --------------------- Writing the mirror --------------------- #
+def mirror_document(payload, synced_at=None):
+    """
+    `$set` body for one TMDB detail payload.
+
+    Top-level fields use the same summary mapping as every other movie
+    document, so search results and lists read mirrored movies unchanged;
+    the trimmed raw payload under `tmdb` serves detail views.
+    """
+    document = TMDBClient.map_movie_summary(payload)
+    document["original_title"] = payload.get("original_title")
+    document["popularity"] = payload.get("popularity")
+    document["tmdb"] = {field: payload.get(field) for field in MIRROR_FIELDS if field in payload}
+    document["tmdb_synced_at"] = synced_at or datetime.utcnow()
+    return document
+
+
+class CatalogWriter:
+    """Buffers movie upserts keyed on `id` and flushes them with one unordered bulk_write per batch"""
+
+    def __init__(self, batch_size=CATALOG_BATCH_SIZE, on_flush=None):
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.operations = []
+        self.upserted = 0
+        self.modified = 0
+
+    def upsert(self, movie_id, fields):
+        self.operations.append(UpdateOne({"id": movie_id}, {"$set": fields}, upsert=True))
+        if len(self.operations) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.operations:
+            return
+        result = movie_collection.bulk_write(self.operations, ordered=False)
+        self.upserted += result.upserted_count
+        self.modified += result.modified_count
+        if self.on_flush:
+            self.on_flush(len(self.operations))
+        self.operations = []
+
+
+# --------------------- Reading the mirror --------------------- #
+def find_mirrored_movie(movie_id):
+    """Raw TMDB payload for `movie_id` from the local mirror, or None if it isn't mirrored"""
+    try:
+        doc = movie_collection.find_one({"id": movie_id, **MIRROR_QUERY}, {"_id": 0, "tmdb": 1})
+    except PyMongoError as e:
+        logger.error(f"Catalog mirror read error: {e}")
+        return None
+    return doc["tmdb"] if doc else None
+
+
+_mirror_state = {"checked_at": None, "mirrored": False}
+
+
+def catalog_is_mirrored():
+    """True once `flask import-catalog` has mirrored movies (rechecked every MIRROR_CHECK_INTERVAL seconds)"""
+    checked_at = _mirror_state["checked_at"]
+    if checked_at is not None and time.monotonic() - checked_at < MIRROR_CHECK_INTERVAL:
+        return _mirror_state["mirrored"]
+    try:
+        _mirror_state["mirrored"] = movie_collection.find_one(MIRROR_QUERY, {"_id": 1}) is not None
+    except PyMongoError as e:
+        logger.error(f"Catalog mirror check error: {e}")
+    _mirror_state["checked_at"] = time.monotonic()
+    return _mirror_state["mirrored"]
@@ -0,0 +1,419 @@
+import re
+import time
+import click
+import requests
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from .database import *
+from .indexes import UNIQUE_INDEXES, ensure_indexes, ensure_unique_index, DuplicateKeysError
+from .reviews import refresh_review_summary
+from .notifications import recount_unread_notifications
+from .users import RECOUNT_LISTS
+from .tmdb_api import tmdb_client, IMAGE_BASE, IMAGE_PROXY_BASE
+from .catalog import CatalogWriter, read_json_lines, mirror_document, MIRROR_QUERY, CATALOG_BATCH_SIZE
+
+
+# Summary fields merged into the canonical copy of a duplicated movie
+MOVIE_FIELDS = ["title", "release_date", "overview", "vote_average", "vote_count", "poster_url"]
+
+
+def _parse_date(value, fallback):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", ""))
+    except ValueError:
+        return fallback
+
+
+class Progress:
+    """Prints batch progress and throughput for one migration step"""
+
+    def __init__(self, label):
+        self.label = label
+        self.count = 0
+        self.start = time.monotonic()
+
+    def update(self, processed):
+        self.count += processed
+        elapsed = time.monotonic() - self.start
+        rate = self.count / elapsed if elapsed else 0
+        click.echo(f"  {self.label}: {self.count} processed ({rate:.0f}/s, {elapsed:.1f}s)")
+
+    def done(self):
+        click.echo(f"{self.label}: done, {self.count} processed in {time.monotonic() - self.start:.1f}s")
+
+
+# --------------------- Movies --------------------- #
+def _merge_movie_group(movie_id, docs):
+    """
+    Collapse every stored copy of `movie_id` into the oldest document.
+
+    Each step is idempotent, so a run interrupted half way can simply be
+    restarted: legacy embedded reviews are upserted into the reviews
+    collection before anything is removed, and the extra copies are
+    deleted last.
+    """
+    docs.sort(key=lambda doc: doc["_id"])
+    canonical = docs[0]
+
+    merged = {}
+    for field in MOVIE_FIELDS:
+        for doc in docs:
+            if doc.get(field) is not None:
+                merged[field] = doc[field]
+                break
+
+    review_operations = []
+    for doc in docs:
+        fallback_date = doc["_id"].generation_time.replace(tzinfo=None)
+        for review in doc.get("reviews") or []:
+            key = {
+                "movie_id": movie_id,
+                "username": review.get("username"),
+                "reviewText": review.get("reviewText"),
+                "date": _parse_date(review.get("date"), fallback_date)
+            }
+            review_operations.append(UpdateOne(key, {"$setOnInsert": key}, upsert=True))
+    if review_operations:
+        review_collection.bulk_write(review_operations, ordered=False)
+
+    update = {"$unset": {"reviews": "", "user_query": ""}}
+    if merged:
+        update["$set"] = merged
+    movie_collection.update_one({"_id": canonical["_id"]}, update)
+
+    duplicate_ids = [doc["_id"] for doc in docs[1:]]
+    if duplicate_ids:
+        movie_collection.delete_many({"_id": {"$in": duplicate_ids}})
+
+    refresh_review_summary(movie_id)
+    return len(duplicate_ids)
+
+
+def _legacy_movie_groups(batch_size):
+    """Stream ids that still have duplicate copies or legacy embedded fields"""
+    return movie_collection.aggregate([
+        {"$match": {"id": {"$ne": None}}},
+        {"$group": {
+            "_id": "$id",
+            "doc_ids": {"$push": "$_id"},
+            "legacy": {"$max": {"$or": [
+                {"$ne": [{"$type": "$reviews"}, "missing"]},
+                {"$ne": [{"$type": "$user_query"}, "missing"]}
+            ]}}
+        }},
+        {"$match": {"$or": [{"doc_ids.1": {"$exists": True}}, {"legacy": True}]}},
+        {"$sort": {"_id": 1}}
+    ], allowDiskUse=True, batchSize=batch_size)
+
+
+def migrate_movies(batch_size):
+    progress = Progress("movies")
+    removed = 0
+    batch = []
+
+    def flush():
+        nonlocal removed
+        doc_ids = [doc_id for group in batch for doc_id in group["doc_ids"]]
+        docs_by_movie = {}
+        for doc in movie_collection.find({"_id": {"$in": doc_ids}}):
+            docs_by_movie.setdefault(doc["id"], []).append(doc)
+        for movie_id, docs in docs_by_movie.items():
+            removed += _merge_movie_group(movie_id, docs)
+        progress.update(len(batch))
+        batch.clear()
+
+    for group in _legacy_movie_groups(batch_size):
+        batch.append(group)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    progress.done()
+    click.echo(f"movies: removed {removed} duplicate documents")
+
+
+def migrate_image_urls():
+    """Point stored poster URLs at the image proxy instead of image.tmdb.org"""
+    if IMAGE_PROXY_BASE == IMAGE_BASE:
+        return
+    start = time.monotonic()
+    result = movie_collection.update_many(
+        {"poster_url": {"$regex": f"^{re.escape(IMAGE_BASE)}"}},
+        [{"$set": {"poster_url": {
+            "$replaceOne": {"input": "$poster_url", "find": IMAGE_BASE, "replacement": IMAGE_PROXY_BASE}
+        }}}]
+    )
+    click.echo(f"image urls: rewrote {result.modified_count} in {time.monotonic() - start:.1f}s")
+
+
+# --------------------- Users --------------------- #
+def migrate_user_counts():
+    """Store list counters on users created before they existed"""
+    start = time.monotonic()
+    result = user_collection.update_many({"counts": {"$exists": False}}, [RECOUNT_LISTS])
+    click.echo(f"user counts: backfilled {result.modified_count} users in {time.monotonic() - start:.1f}s")
+
+
+# --------------------- Notifications --------------------- #
+def migrate_notifications(batch_size):
+    """Move notifications embedded in user documents into the notifications collection"""
+    progress = Progress("notifications")
+    users = user_collection.find(
+        {"notifications": {"$exists": True}},
+        {"_id": 1, "username": 1, "notifications": 1}
+    ).sort("_id", 1).batch_size(batch_size)
+
+    pending = 0
+    for user in users:
+        username = user["username"]
+        operations = []
+        for notification in user.get("notifications") or []:
+            key = {
+                "username": username,
+                "movie_id": notification.get("movie_id"),
+                "reviewer": notification.get("reviewer"),
+                "text": notification.get("text"),
+                "date": _parse_date(notification.get("date"), datetime.utcnow())
+            }
+            operations.append(UpdateOne(key, {"$setOnInsert": key}, upsert=True))
+        if operations:
+            notification_collection.bulk_write(operations, ordered=False)
+
+        user_collection.update_one(
+            {"_id": user["_id"]},
+            {
+                "$unset": {"notifications": ""},
+                "$set": {"unread_notifications": notification_collection.count_documents({"username": username})}
+            }
+        )
+        pending += 1
+        if pending >= batch_size:
+            progress.update(pending)
+            pending = 0
+    if pending:
+        progress.update(pending)
+
+    progress.done()
+
+
+def recount_notifications(batch_size):
+    """Correct unread counters that drifted, e.g. from notifications expired by the retention TTL"""
+    progress = Progress("notification counters")
+    corrected = 0
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        users = list(
+            user_collection.find(query, {"_id": 1, "username": 1, "notifications_version": 1})
+            .sort("_id", 1).limit(batch_size)
+        )
+        if not users:
+            break
+        last_id = users[-1]["_id"]
+        corrected += recount_unread_notifications(users)
+        progress.update(len(users))
+    progress.done()
+    click.echo(f"notification counters: corrected {corrected}")
+
+
+# --------------------- Catalog mirror --------------------- #
+def import_id_export(source, batch_size, prune):
+    """
+    Stream a TMDB daily ID export (`movie_ids_MM_DD_YYYY.json.gz`).
+
+    Every listed id is upserted with its popularity and stamped with this
+    run's export date; new ids get a skeleton document for
+    `--fetch-missing` or a later detail dump to fill in. With `prune`,
+    movies missing from the export (deleted on TMDB) drop their mirrored
+    payload so lookups fall back to the live API.
+    """
+    progress = Progress("id export")
+    export_date = datetime.utcnow()
+    writer = CatalogWriter(batch_size, on_flush=progress.update)
+    for entry in read_json_lines(source):
+        if entry.get("id") is None:
+            continue
+        writer.upsert(entry["id"], {
+            "original_title": entry.get("original_title"),
+            "popularity": entry.get("popularity"),
+            "adult": entry.get("adult", False),
+            "export_date": export_date
+        })
+    writer.flush()
+    progress.done()
+    click.echo(f"id export: {writer.upserted} new movies")
+
+    if prune:
+        result = movie_collection.update_many(
+            {"export_date": {"$lt": export_date}, **MIRROR_QUERY},
+            {"$unset": {"tmdb": "", "tmdb_synced_at": ""}}
+        )
+        click.echo(f"id export: pruned {result.modified_count} movies no longer on TMDB")
+
+
+def import_detail_dump(source, batch_size):
+    """Stream a JSON-lines dump of full TMDB movie payloads (a full dump or a daily delta) into the mirror"""
+    progress = Progress(f"details {source}")
+    writer = CatalogWriter(batch_size, on_flush=progress.update)
+    synced_at = datetime.utcnow()
+    for payload in read_json_lines(source):
+        if payload.get("id") is None:
+            continue
+        writer.upsert(payload["id"], mirror_document(payload, synced_at))
+    writer.flush()
+    progress.done()
+    click.echo(f"details: {writer.upserted} new, {writer.modified} updated")
+
+
+def fetch_missing_details(limit, batch_size, concurrency):
+    """Fill in up to `limit` not-yet-mirrored movies from the live API, most popular first"""
+    progress = Progress("fetch missing")
+    writer = CatalogWriter(batch_size, on_flush=progress.update)
+    missing = movie_collection.find(
+        {"tmdb": {"$exists": False}}, {"_id": 0, "id": 1}
+    ).sort("popularity", -1).limit(limit).batch_size(batch_size)
+
+    def fetch(movie_id):
+        try:
+            return tmdb_client.get_movie(movie_id)
+        except requests.RequestException as e:
+            click.echo(f"  could not fetch movie {movie_id}: {e}", err=True)
+            return None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for payload in executor.map(fetch, (doc["id"] for doc in missing)):
+            if payload and payload.get("id") is not None:
+                writer.upsert(payload["id"], mirror_document(payload))
+    writer.flush()
+    progress.done()
+
+
+# --------------------- Indexes --------------------- #
+def build_indexes():
+    start = time.monotonic()
+    ensure_indexes()
+    for collection_name, keys in UNIQUE_INDEXES:
+        field = ", ".join(key for key, _ in keys)
+        try:
+            if ensure_unique_index(db[collection_name], keys):
+                click.echo(f"  built unique index on {collection_name}.{field}")
+            else:
+                click.echo(f"  unique index on {collection_name}.{field} already present")
+        except DuplicateKeysError as e:
+            click.echo(f"  not making {collection_name}.{field} unique, resolve these first: {e}", err=True)
+        except PyMongoError as e:
+            click.echo(f"  could not build unique index on {collection_name}.{field}: {e}", err=True)
+    click.echo(f"indexes: done in {time.monotonic() - start:.1f}s")
+
+
+# --------------------- Recommendations --------------------- #
+def build_recommendations(full, batch_size, top_k, min_count):
+    try:
+        from .cooccurrence import CooccurrenceModel
+    except ImportError as e:
+        raise click.ClickException(f"{e}: pip install -r requirements-recommendations.txt")
+
+    model = None if full else CooccurrenceModel.load()
+    users = Progress("users")
+    if model is None:
+        model = CooccurrenceModel()
+        columns = model.build(batch_size, progress=users.update)
+    else:
+        columns = model.update(batch_size, progress=users.update)
+    users.done()
+
+    neighbors = Progress("neighbour lists")
+    model.write_neighbors(columns, top_k, min_count, progress=neighbors.update)
+    neighbors.done()
+    # Only saved once the neighbours are written, so a failed run is simply redone next time
+    model.save()
+
+
+def register_commands(app):
+    @app.cli.command("migrate-catalog")
+    @click.option("--batch-size", default=500, show_default=True, help="Documents per batch.")
+    @click.option("--skip-indexes", is_flag=True, help="Only merge data, don't build indexes.")
+    def migrate_catalog(batch_size, skip_indexes):
+        """Deduplicate the movie catalog, move embedded reviews and
+        notifications into their collections and build required indexes.
+
+        Safe to re-run: every step only touches documents that still need it.
+        """
+        start = time.monotonic()
+        migrate_movies(batch_size)
+        migrate_image_urls()
+        migrate_notifications(batch_size)
+        recount_notifications(batch_size)
+        migrate_user_counts()
+        if not skip_indexes:
+            build_indexes()
+        click.echo(f"Migration finished in {time.monotonic() - start:.1f}s")
+
+    @app.cli.command("recount-notifications")
+    @click.option("--batch-size", default=500, show_default=True, help="Users per batch.")
+    def recount_notifications_command(batch_size):
+        """Correct unread notification counters from the notifications collection.
+
+        Notifications removed by the retention TTL don't decrement the
+        counters; run this periodically (e.g. daily) to fix the drift.
+        """
+        start = time.monotonic()
+        recount_notifications(batch_size)
+        click.echo(f"Recount finished in {time.monotonic() - start:.1f}s")
+
+    @app.cli.command("import-catalog")
+    @click.option("--ids", "id_export", help="TMDB daily ID export (path or URL, .json.gz).")
+    @click.option("--details", "detail_dumps", multiple=True, help="JSON-lines dump of movie payloads; repeatable.")
+    @click.option("--fetch-missing", default=0, show_default=True, help="Fetch up to N unmirrored movies from the API.")
+    @click.option("--prune", is_flag=True, help="Unmirror movies missing from the ID export.")
+    @click.option("--batch-size", default=CATALOG_BATCH_SIZE, show_default=True, help="Upserts per bulk write.")
+    @click.option("--concurrency", default=4, show_default=True, help="Parallel API fetches for --fetch-missing.")
+    def import_catalog(id_export, detail_dumps, fetch_missing, prune, batch_size, concurrency):
+        """Mirror the TMDB catalog into the movies collection.
+
+        Files are streamed line by line, so full exports never sit in
+        memory. Every step is an idempotent upsert: run it daily with the
+        new ID export and any delta dumps to keep the mirror current.
+        """
+        start = time.monotonic()
+        if id_export:
+            import_id_export(id_export, batch_size, prune)
+        for dump in detail_dumps:
+            import_detail_dump(dump, batch_size)
+        if fetch_missing:
+            fetch_missing_details(fetch_missing, batch_size, concurrency)
+        click.echo(f"Catalog import finished in {time.monotonic() - start:.1f}s")
+
+    @app.cli.command("build-assets")
+    def build_assets():
+        """Write content-hashed, precompressed copies of the static files.
+
+        The app also does this at startup; run it at image build time when
+        the deployed filesystem is read-only.
+        """
+        from .assets import asset_manifest
+        for name, hashed in asset_manifest.build().items():
+            click.echo(f"{name} -> {hashed}")
+
+    @app.cli.command("build-recommendations")
+    @click.option("--full", is_flag=True, help="Rebuild from every user instead of only changed ones.")
+    @click.option("--batch-size", default=5000, show_default=True, help="Users read per batch.")
+    @click.option("--top-k", default=50, show_default=True, help="Neighbours stored per movie.")
+    @click.option("--min-count", default=2.0, show_default=True, help="Least weighted co-occurrence kept.")
+    def build_recommendations_command(full, batch_size, top_k, min_count):
+        """Precompute "people who watched this also watched" neighbours.
+
+        Builds a sparse item-item co-occurrence matrix over every user's
+        lists (numpy/scipy) and stores each movie's top neighbours in
+        movie_neighbors. The matrices are kept on disk, so later runs only
+        re-read users whose lists changed; the first run, or --full,
+        streams all users.
+        """
+        start = time.monotonic()
+        build_recommendations(full, batch_size, top_k, min_count)
+        click.echo(f"Recommendations built in {time.monotonic() - start:.1f}s")
@@ -0,0 +1,86 @@
+import os
+import gzip
+import brotli
+
+
+# Bodies smaller than this gain little and cost a compressor call
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/css", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+}
+# Preferred first when the client weights them equally
+ENCODINGS = ("br", "gzip")
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Dynamic bodies are compressed on every response, so trade a few percent
+# of size for speed; precompressed static files use the maximum
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def negotiate_encoding(accept_encoding, available=ENCODINGS):
+    """Best of `available` for an Accept-Encoding header (RFC 9110 q-values); None means identity"""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(data, encoding, static=False):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if static else BROTLI_QUALITY)
+    # mtime=0 keeps the output byte-identical for identical input
+    return gzip.compress(data, compresslevel=9 if static else GZIP_LEVEL, mtime=0)
+
+
+def compressible(response):
+    return (
+        response.status_code == 200
+        and response.mimetype in COMPRESSIBLE_TYPES
+        and "Content-Encoding" not in response.headers
+    )
+
+
+def compress_body(response, data, accept_encoding):
+    """Set the encoding headers and return the compressed body, or None when identity is better"""
+    response.vary.add("Accept-Encoding")
+    if len(data) < COMPRESS_MIN_SIZE:
+        return None
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return None
+    response.headers["Content-Encoding"] = encoding
+    # The compressed bytes differ, so the strong ETag becomes weak; our
+    # If-None-Match checks compare weakly and still answer 304
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        response.headers["ETag"] = "W/" + etag
+    return compress(data, encoding)
+
+
+def compress_response(response, accept_encoding):
+    """Flask after_request: gzip/brotli a buffered text response (files and streams are left alone)"""
+    if response.direct_passthrough or response.is_streamed or not compressible(response):
+        return response
+    body = compress_body(response, response.get_data(), accept_encoding)
+    if body is not None:
+        response.set_data(body)
+    return response
+
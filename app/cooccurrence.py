@@ -0,0 +1,267 @@
+import os
+import logging
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import scipy.sparse as sp
+from pymongo import ReplaceOne, DeleteOne
+from .database import *
+from .recommendations import LIST_WEIGHTS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Needs numpy and scipy: pip install -r requirements-recommendations.txt
+RECOMMENDATIONS_STATE_DIR = os.environ.get(
+    "RECOMMENDATIONS_STATE_DIR", os.path.join(tempfile.gettempdir(), "movie-tracker-recommendations")
+)
+NEIGHBORS_TOP_K = 50
+USER_BATCH_SIZE = 5000
+NEIGHBOR_WRITE_BATCH = 1000
+# Pairs seen together less than this (in weighted users) are noise, not taste
+MIN_COOCCURRENCE = 2.0
+# Incremental runs re-read users changed this long before the previous run
+# started, absorbing clock skew between this host and the database
+CHECKPOINT_OVERLAP = timedelta(minutes=5)
+
+USER_PROJECTION = {"_id": 1, **{field: 1 for field in LIST_WEIGHTS}}
+
+
+def _grown(matrix, shape):
+    """`matrix` as CSR, zero-padded to `shape` (new movies and users only ever add rows/columns)"""
+    matrix = matrix.tocsr()
+    if matrix.shape != shape:
+        matrix.resize(shape)
+    return matrix
+
+
+def _atomic_save(path, save):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    os.close(fd)
+    try:
+        with open(temp_path, "wb") as f:
+            save(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class CooccurrenceModel:
+    """
+    Weighted item-item co-occurrence over every user's lists.
+
+    `users` is the sparse users x movies matrix (LIST_WEIGHTS per entry)
+    and `counts` is users.T @ users, accumulated one batch of users at a
+    time. The diagonal holds each movie's own weight, so cosine
+    similarity falls out as counts[i, j] / sqrt(counts[i, i] * counts[j, j]).
+    Both matrices are kept on disk so later runs only re-read users whose
+    lists changed: their old rows are subtracted and new rows added.
+    """
+
+    def __init__(self):
+        self.movie_ids = []
+        self.movie_index = {}
+        self.user_ids = []
+        self.user_index = {}
+        self.users = sp.csr_matrix((0, 0), dtype=np.float32)
+        self.counts = sp.csr_matrix((0, 0), dtype=np.float32)
+        self.checkpoint = None
+
+    # --------------------- Building --------------------- #
+    def _columns(self, movie_ids):
+        columns = np.empty(len(movie_ids), dtype=np.int64)
+        for i, movie_id in enumerate(movie_ids):
+            column = self.movie_index.get(movie_id)
+            if column is None:
+                column = self.movie_index[movie_id] = len(self.movie_ids)
+                self.movie_ids.append(movie_id)
+            columns[i] = column
+        return columns
+
+    def _field_matrix(self, users, field):
+        """Binary len(users) x movies matrix of one list"""
+        rows, ids = [], []
+        for row, user in enumerate(users):
+            for movie_id in user.get(field) or []:
+                # Movie ids are ints; anything else is a stray client value
+                if isinstance(movie_id, int) and not isinstance(movie_id, bool):
+                    rows.append(row)
+                    ids.append(movie_id)
+        ids = np.asarray(ids, dtype=np.int64)
+        # One dict lookup per distinct movie in the batch, not per list entry
+        unique, inverse = np.unique(ids, return_inverse=True)
+        columns = self._columns(unique.tolist())[inverse]
+        matrix = sp.csr_matrix(
+            (np.ones(len(ids), dtype=np.float32), (np.asarray(rows, dtype=np.int64), columns)),
+            shape=(len(users), len(self.movie_ids))
+        )
+        matrix.data[:] = 1  # duplicate entries in one list still count once
+        return matrix
+
+    def _rows(self, users):
+        """Weighted rows for a batch of user documents; a movie on both lists takes the larger weight"""
+        matrices = [self._field_matrix(users, field) for field in LIST_WEIGHTS]
+        shape = (len(users), len(self.movie_ids))
+        rows = sp.csr_matrix(shape, dtype=np.float32)
+        for matrix, weight in zip(matrices, LIST_WEIGHTS.values()):
+            rows = rows.maximum(_grown(matrix, shape) * np.float32(weight))
+        return rows.tocsr()
+
+    def _add(self, rows, sign=1):
+        """counts += sign * rows.T @ rows"""
+        shape = (len(self.movie_ids), len(self.movie_ids))
+        rows = _grown(rows, (rows.shape[0], shape[1]))
+        product = (rows.T @ rows).tocsr()
+        self.counts = _grown(self.counts, shape) + (product if sign > 0 else -product)
+
+    def build(self, batch_size=USER_BATCH_SIZE, progress=None):
+        """Rebuild from every user, streamed by _id in batches"""
+        self.__init__()
+        started = datetime.utcnow()
+        blocks = []
+        last_id = None
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+            users = list(user_collection.find(query, USER_PROJECTION).sort("_id", 1).limit(batch_size))
+            if not users:
+                break
+            last_id = users[-1]["_id"]
+            rows = self._rows(users)
+            self._add(rows)
+            blocks.append(rows)
+            self.user_ids.extend(str(user["_id"]) for user in users)
+            if progress:
+                progress(len(users))
+
+        width = len(self.movie_ids)
+        self.users = sp.vstack([_grown(block, (block.shape[0], width)) for block in blocks]).tocsr() if blocks \
+            else sp.csr_matrix((0, width), dtype=np.float32)
+        self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids)}
+        self.counts.eliminate_zeros()
+        self.checkpoint = started
+        return np.arange(width)
+
+    def update(self, batch_size=USER_BATCH_SIZE, progress=None):
+        """
+        Fold in users whose lists changed since the last checkpoint.
+        Returns the movie columns whose neighbour lists may have changed.
+        """
+        started = datetime.utcnow()
+        touched = set()
+        last_id = None
+        query = {"lists_updated_at": {"$gt": self.checkpoint - CHECKPOINT_OVERLAP}}
+        while True:
+            page = {**query, "_id": {"$gt": last_id}} if last_id is not None else query
+            users = list(user_collection.find(page, USER_PROJECTION).sort("_id", 1).limit(batch_size))
+            if not users:
+                break
+            last_id = users[-1]["_id"]
+
+            keys = [str(user["_id"]) for user in users]
+            new_rows = self._rows(users)
+            width = len(self.movie_ids)
+            self.users = _grown(self.users, (len(self.user_ids), width))
+            changed = [self.user_index[key] for key in keys if key in self.user_index]
+            old_rows = self.users[changed]
+
+            self._add(old_rows, sign=-1)
+            self._add(new_rows)
+            touched.update(old_rows.indices.tolist(), new_rows.indices.tolist())
+
+            # Drop the users' old rows and append the new ones
+            keep = np.ones(len(self.user_ids), dtype=bool)
+            keep[changed] = False
+            self.users = sp.vstack([self.users[keep], new_rows]).tocsr()
+            self.user_ids = [user_id for user_id, kept in zip(self.user_ids, keep) if kept] + keys
+            self.user_index = {user_id: row for row, user_id in enumerate(self.user_ids)}
+            if progress:
+                progress(len(users))
+
+        self.counts.eliminate_zeros()
+        self.checkpoint = started
+        if not touched:
+            return np.empty(0, dtype=np.int64)
+        # A touched movie's own row changed, and so did every score against it (its norm moved)
+        touched = np.fromiter(touched, dtype=np.int64)
+        return np.union1d(touched, self.counts[touched].indices)
+
+    # --------------------- Neighbours --------------------- #
+    def neighbors(self, columns, top_k=NEIGHBORS_TOP_K, min_count=MIN_COOCCURRENCE):
+        """Yield (movie_id, [{id, score}, ...]) with the top_k cosine neighbours of each column"""
+        counts = self.counts.tocsr()
+        diagonal = counts.diagonal()
+        norms = np.zeros_like(diagonal)
+        np.divide(1, np.sqrt(diagonal), out=norms, where=diagonal > 0)
+
+        movie_ids = np.asarray(self.movie_ids, dtype=np.int64)
+        for column in columns:
+            start, end = counts.indptr[column], counts.indptr[column + 1]
+            others = counts.indices[start:end]
+            together = counts.data[start:end]
+            keep = (others != column) & (together >= min_count)
+            others, together = others[keep], together[keep]
+            scores = together * norms[column] * norms[others]
+            # Best score first, ties by movie id, so full and incremental runs agree
+            order = np.lexsort((movie_ids[others], -scores))[:top_k]
+            yield int(movie_ids[column]), [
+                {"id": int(movie_id), "score": round(float(score), 4)}
+                for movie_id, score in zip(movie_ids[others[order]], scores[order])
+            ]
+
+    def write_neighbors(self, columns, top_k=NEIGHBORS_TOP_K, min_count=MIN_COOCCURRENCE, progress=None):
+        """Replace the stored neighbour lists of `columns`; movies left without neighbours are removed"""
+        now = datetime.utcnow()
+        operations = []
+
+        def flush():
+            movie_neighbors_collection.bulk_write(operations, ordered=False)
+            if progress:
+                progress(len(operations))
+            operations.clear()
+
+        for movie_id, neighbors in self.neighbors(columns, top_k, min_count):
+            if neighbors:
+                operations.append(ReplaceOne(
+                    {"_id": movie_id}, {"neighbors": neighbors, "updated_at": now}, upsert=True
+                ))
+            else:
+                operations.append(DeleteOne({"_id": movie_id}))
+            if len(operations) >= NEIGHBOR_WRITE_BATCH:
+                flush()
+        if operations:
+            flush()
+
+    # --------------------- State --------------------- #
+    def save(self, directory=RECOMMENDATIONS_STATE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        _atomic_save(os.path.join(directory, "users.npz"), lambda f: sp.save_npz(f, self.users))
+        _atomic_save(os.path.join(directory, "counts.npz"), lambda f: sp.save_npz(f, self.counts.tocsr()))
+        # Written last: it names the matrices' rows and columns and marks the state complete
+        _atomic_save(os.path.join(directory, "index.npz"), lambda f: np.savez(
+            f,
+            movie_ids=np.asarray(self.movie_ids, dtype=np.int64),
+            user_ids=np.asarray(self.user_ids, dtype=str),
+            checkpoint=np.asarray(self.checkpoint.isoformat())
+        ))
+
+    @classmethod
+    def load(cls, directory=RECOMMENDATIONS_STATE_DIR):
+        """The saved model, or None if there is none yet (or it doesn't match up)"""
+        model = cls()
+        try:
+            with np.load(os.path.join(directory, "index.npz")) as index:
+                model.movie_ids = index["movie_ids"].tolist()
+                model.user_ids = index["user_ids"].tolist()
+                model.checkpoint = datetime.fromisoformat(str(index["checkpoint"]))
+            model.users = sp.load_npz(os.path.join(directory, "users.npz")).tocsr()
+            model.counts = sp.load_npz(os.path.join(directory, "counts.npz")).tocsr()
+        except FileNotFoundError:
+            return None
+        if model.users.shape[0] != len(model.user_ids) or model.counts.shape[0] > len(model.movie_ids):
+            logger.error(f"Recommendation state in {directory} is inconsistent, ignoring it")
+            return None
+        model.movie_index = {movie_id: column for column, movie_id in enumerate(model.movie_ids)}
+        model.user_index = {user_id: row for row, user_id in enumerate(model.user_ids)}
+        return model
@@ -0,0 +1,138 @@
+import os
+import time
+import logging
+import threading
+from pymongo import MongoClient
+from pymongo.monitoring import ServerHeartbeatListener
+from .metrics import MongoCommandMetrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+MONGO_URI = os.environ.get("MONGO_URI")
+MONGO_DB_NAME = os.environ.get("MONGO_DB_NAME", "movie_tracker_123")
+
+if not MONGO_URI:
+    raise ValueError("MONGO_URI environment variable is required")
+
+# A heartbeat older than this means we've lost track of the cluster
+HEALTH_STALE_AFTER = float(os.environ.get("MONGO_HEALTH_STALE_AFTER", "60"))
+
+
+class HeartbeatMonitor(ServerHeartbeatListener):
+    """Records the outcome of pymongo's own background server heartbeats, per server"""
+
+    def __init__(self):
+        self.servers = {}
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.servers[event.connection_id] = (True, time.monotonic(), round(event.duration * 1000, 2), None)
+
+    def failed(self, event):
+        self.servers[event.connection_id] = (False, time.monotonic(), None, str(event.reply))
+
+    def status(self):
+        now = time.monotonic()
+        servers = list(self.servers.values())
+        reachable = [s for s in servers if s[0] and now - s[1] < HEALTH_STALE_AFTER]
+        if reachable:
+            return {"healthy": True, "database": "connected", "latency_ms": min(s[2] for s in reachable)}
+        if not servers:
+            return {"healthy": False, "database": "connecting"}
+        errors = [s[3] for s in servers if s[3]]
+        return {"healthy": False, "database": "disconnected", "error": errors[-1] if errors else "heartbeat stale"}
+
+
+class Database:
+    """
+    Process-wide MongoClient factory.
+
+    The client is built on first use and rebuilt if the process has forked
+    since, so gunicorn workers never share sockets. Construction does no
+    network I/O; pymongo connects and heartbeats in the background.
+    """
+
+    def __init__(self, uri, name):
+        self.uri = uri
+        self.name = name
+        self.monitor = HeartbeatMonitor()
+        self.command_metrics = MongoCommandMetrics()
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self.monitor = HeartbeatMonitor()
+                    self._client = MongoClient(
+                        self.uri,
+                        minPoolSize=int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+                        maxPoolSize=int(os.environ.get("MONGO_MAX_POOL_SIZE", "50")),
+                        serverSelectionTimeoutMS=int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+                        connectTimeoutMS=10000,
+                        socketTimeoutMS=30000,
+                        tls=os.environ.get("MONGO_TLS", "true").lower() == "true",
+                        retryWrites=True,
+                        w="majority",
+                        event_listeners=[self.monitor, self.command_metrics]
+                    )
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.name]
+
+    def health(self):
+        """Answer from the latest heartbeats; touching the client starts monitoring if needed"""
+        if self._client is None or self._pid != os.getpid():
+            self.client
+        return self.monitor.status()
+
+
+class LazyCollection:
+    """Stands in for a pymongo Collection, resolving it against the current process's client"""
+
+    def __init__(self, database, name):
+        self._database = database
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._database.db[self._name], attr)
+
+    def __getitem__(self, key):
+        return self._database.db[self._name][key]
+
+
+class LazyDatabase:
+    """Stands in for a pymongo Database in the same way"""
+
+    def __init__(self, database):
+        self._database = database
+
+    def __getattr__(self, attr):
+        return getattr(self._database.db, attr)
+
+    def __getitem__(self, name):
+        return LazyCollection(self._database, name)
+
+
+database = Database(MONGO_URI, MONGO_DB_NAME)
+db = LazyDatabase(database)
+
+# Define collections
+user_collection = db["users"]
+movie_collection = db["movies"]
+movie_details_cache_collection = db["movie_details_cache"]
+search_cache_collection = db["search_cache"]
+notification_jobs_collection = db["notification_jobs"]
+notification_collection = db["notifications"]
+review_collection = db["reviews"]
+movie_neighbors_collection = db["movie_neighbors"]
@@ -0,0 +1,74 @@
+import os
+import random
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class FeaturedPool:
+    """
+    Per-worker, in-memory pool of homepage movies.
+
+    `loader` is called on a background thread: right away when the thread
+    starts, again with backoff while the pool is still empty, and then
+    every `interval` seconds. Requests never load; they only take a random
+    slice of the current snapshot, which is empty until the first load.
+    """
+
+    def __init__(self, loader, interval=900, retry_initial=1, retry_max=60):
+        self.loader = loader
+        self.interval = interval
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self._movies = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def refresh(self):
+        """Reload the pool; returns False if the loader failed or came back empty"""
+        try:
+            movies = self.loader()
+        except Exception as e:
+            logger.error(f"Featured pool refresh error: {e}")
+            return False
+        if not movies:
+            return False
+        # Swap the whole list so readers never see a half-built pool
+        self._movies = movies
+        return True
+
+    def _run(self):
+        retry = self.retry_initial
+        while not self._stop.is_set():
+            if self.refresh() or self._movies:
+                retry = self.retry_initial
+                wait = self.interval
+            else:
+                # Nothing to show yet (empty catalog, TMDB or Mongo down): try again soon
+                wait = min(retry, self.interval)
+                retry = min(retry * 2, self.retry_max)
+            if self._stop.wait(wait):
+                return
+
+    def start(self):
+        """Start the refresh thread for this process (no-op if already running)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name="featured-pool", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        self._stop.set()
+
+    def sample(self, size):
+        """Return up to `size` random movies from the pool (none until its first load finishes)"""
+        if self._pid != os.getpid():
+            self.start()
+        movies = self._movies
+        return random.sample(movies, min(size, len(movies)))
@@ -1,8 +1,26 @@
 
+import os
+import time
 import logging
+import unicodedata
+import contextvars
+import math
 import requests
+from pymongo import UpdateOne, DESCENDING
+from pymongo.errors import PyMongoError
+from .database import *
 from .tmdb_api import *
-from datetime import datetime
+from .cache import MovieDetailsCache
+from .catalog import find_mirrored_movie, catalog_is_mirrored
+from .featured import FeaturedPool
+from .typeahead import TypeaheadIndex
+from .http_cache import make_etag, etag_matches, cache_headers, tmdb_epoch, PRIVATE_REVALIDATE
+from .notifications import *
+from .reviews import *
+from .users import *
+from .recommendations import recommend_movie_ids
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 
@@ -12,67 +30,380 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-IMAGE_BASE = "https://image.tmdb.org/t/p/"
+DETAIL_FETCH_CONCURRENCY = int(os.environ.get("DETAIL_FETCH_CONCURRENCY", "8"))
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", "86400"))
+FEATURED_SOURCE = os.environ.get("FEATURED_SOURCE", "trending")
+FEATURED_POOL_SIZE = int(os.environ.get("FEATURED_POOL_SIZE", "100"))
+FEATURED_REFRESH_INTERVAL = int(os.environ.get("FEATURED_REFRESH_INTERVAL", "900"))
+SEARCH_SOURCE = os.environ.get("SEARCH_SOURCE", "auto")
+SEARCH_LOCAL_MIN_RESULTS = int(os.environ.get("SEARCH_LOCAL_MIN_RESULTS", "5"))
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_RESULTS = 1000
+TYPEAHEAD_MAX_MOVIES = int(os.environ.get("TYPEAHEAD_MAX_MOVIES", "100000"))
+TYPEAHEAD_REFRESH_INTERVAL = int(os.environ.get("TYPEAHEAD_REFRESH_INTERVAL", "60"))
+
+MOVIE_SUMMARY_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "release_date": 1, "overview": 1,
+    "vote_average": 1, "vote_count": 1, "poster_url": 1
+}
+
+# Shared by every request in the worker so total outbound concurrency stays bounded
+detail_executor = ThreadPoolExecutor(max_workers=DETAIL_FETCH_CONCURRENCY, thread_name_prefix="tmdb-detail")
 
 
 # --------------------- Helper Functions --------------------- #
-def search_movie_by_api_key(query, api_key):
-    """Search movies using TMDB API"""
+def normalize_query(query):
+    """Fold case, accents/compatibility forms and whitespace so equivalent queries share a key"""
+    folded = unicodedata.normalize("NFKD", query or "")
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return " ".join(folded.casefold().split())
+
+
+def store_movie_summaries(movies):
+    """Upsert card-sized movie data once per TMDB id"""
+    operations = [
+        UpdateOne({"id": movie["id"]}, {"$set": movie}, upsert=True)
+        for movie in movies if movie.get("id") is not None
+    ]
+    if operations:
+        movie_collection.bulk_write(operations, ordered=False)
+
+
+def find_movies_by_ids(movie_ids, projection=MOVIE_SUMMARY_PROJECTION):
+    """Fetch stored movies with one $in query, returned in the order of `movie_ids`"""
+    by_id = {movie["id"]: movie for movie in movie_collection.find({"id": {"$in": movie_ids}}, projection)}
+    return [by_id[movie_id] for movie_id in movie_ids if movie_id in by_id]
+
+
+def search_movies_local(query, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    Full-text search over the stored catalog.
+
+    Results are ranked by text relevance weighted by log(vote_count), so
+    well-known titles win ties. Returns (movies, total), with total capped
+    at SEARCH_MAX_RESULTS.
+    """
+    result = list(movie_collection.aggregate([
+        {"$match": {"$text": {"$search": query}, "title": {"$ne": None}}},
+        {"$addFields": {"_rank": {"$multiply": [
+            {"$meta": "textScore"},
+            {"$log10": {"$add": [{"$ifNull": ["$vote_count", 0]}, 10]}}
+        ]}}},
+        {"$sort": {"_rank": -1, "id": 1}},
+        {"$limit": SEARCH_MAX_RESULTS},
+        {"$facet": {
+            "movies": [{"$skip": (page - 1) * page_size}, {"$limit": page_size}, {"$project": MOVIE_SUMMARY_PROJECTION}],
+            "total": [{"$count": "count"}]
+        }}
+    ]))
+    facets = result[0] if result else {}
+    total = facets["total"][0]["count"] if facets.get("total") else 0
+    return facets.get("movies", []), total
+
+
+def search_movies_cached(user_query, page=1):
+    """
+    Search for movies, locally first and then through TMDB.
+
+    Returns (movies, total_pages). With SEARCH_SOURCE=auto the local text
+    index answers whenever the TMDB catalog is mirrored and it has at
+    least SEARCH_LOCAL_MIN_RESULTS matches. Without a mirror the movies
+    collection only holds earlier search results, where loose $text
+    matches on common words would hide everything else, so TMDB answers.
+    Repeats of TMDB queries are served from the search cache with an
+    indexed point lookup plus one $in fetch.
+    """
+    query = normalize_query(user_query)
+    if not query:
+        return [], 0
+
+    if SEARCH_SOURCE == "local" or (SEARCH_SOURCE == "auto" and catalog_is_mirrored()):
+        try:
+            movies, total = search_movies_local(query, page)
+        except PyMongoError as e:
+            # e.g. the text index is still being built
+            logger.error(f"Local search error: {e}")
+            movies, total = [], 0
+        if SEARCH_SOURCE == "local" or total >= SEARCH_LOCAL_MIN_RESULTS:
+            return movies, max(math.ceil(total / SEARCH_PAGE_SIZE), 1)
+
+    cached = search_cache_collection.find_one(
+        {"query": query, "page": page, "expires_at": {"$gt": datetime.utcnow()}},
+        {"_id": 0, "movie_ids": 1, "total_pages": 1}
+    )
+    if cached:
+        return find_movies_by_ids(cached["movie_ids"]), cached.get("total_pages", 1)
+
     try:
-        url = f"https://api.themoviedb.org/3/search/movie?api_key={api_key}&query={query}&language=en-US"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.json().get("results", [])
+        response = tmdb_client.search_movies(query, page=page)
     except requests.RequestException as e:
         logger.error(f"TMDB API error: {e}")
-        return []
+        return [], 0
+
+    movies = [TMDBClient.map_movie_summary(movie) for movie in response.get("results", [])]
+    total_pages = response.get("total_pages", 1)
+    store_movie_summaries(movies)
+    search_cache_collection.update_one(
+        {"query": query, "page": page},
+        {"$set": {
+            "movie_ids": [movie["id"] for movie in movies],
+            "total_pages": total_pages,
+            "expires_at": datetime.utcnow() + timedelta(seconds=SEARCH_CACHE_TTL)
+        }},
+        upsert=True
+    )
+    return movies, total_pages
+
+
+def _load_featured_movies():
+    """Build the featured pool from TMDB trending/popular lists, or a random catalog sample"""
+    if FEATURED_SOURCE in ("trending", "popular"):
+        fetch_page = tmdb_client.trending_movies if FEATURED_SOURCE == "trending" else tmdb_client.popular_movies
+        movies = []
+        page = 1
+        try:
+            while len(movies) < FEATURED_POOL_SIZE:
+                response = fetch_page(page=page)
+                movies.extend(TMDBClient.map_movie_summary(movie) for movie in response.get("results", []))
+                if page >= response.get("total_pages", 1):
+                    break
+                page += 1
+        except requests.RequestException as e:
+            logger.error(f"Featured movies fetch error, falling back to catalog sample: {e}")
+        if movies:
+            movies = movies[:FEATURED_POOL_SIZE]
+            store_movie_summaries(movies)
+            return movies
+
+    return list(movie_collection.aggregate([
+        {"$match": {"title": {"$exists": True}}},
+        {"$sample": {"size": FEATURED_POOL_SIZE}},
+        {"$project": MOVIE_SUMMARY_PROJECTION}
+    ]))
+
+
+featured_pool = FeaturedPool(_load_featured_movies, interval=FEATURED_REFRESH_INTERVAL)
+
+
+def recommended_movies(username, limit=20):
+    """Movie cards for the user's co-occurrence recommendations, topped up from the featured pool"""
+    try:
+        movies = find_movies_by_ids(recommend_movie_ids(username, limit))
+    except PyMongoError as e:
+        logger.error(f"Recommendations error: {e}")
+        movies = []
+    if len(movies) >= limit:
+        return movies, True
+    seen = {movie["id"] for movie in movies}
+    featured = [movie for movie in featured_pool.sample(limit) if movie.get("id") not in seen]
+    return movies + featured[:limit - len(movies)], bool(movies)
+
+
+def _load_typeahead_movies(after_id, limit):
+    """Stream movies for the typeahead index: the most voted ones, or those added after `after_id`"""
+    projection = {"_id": 1, "id": 1, "title": 1, "original_title": 1, "release_date": 1, "vote_count": 1, "poster_url": 1}
+    if after_id is None:
+        # Remember where the catalog ends now, so the first update starts from here
+        newest = movie_collection.find_one({}, {"_id": 1}, sort=[("_id", DESCENDING)])
+        if newest is None:
+            return []
+        movies = movie_collection.find({"title": {"$ne": None}}, projection).sort("vote_count", DESCENDING)
+        return [*movies.limit(limit).allow_disk_use(True).batch_size(5000), {"_id": newest["_id"]}]
+    return movie_collection.find({"_id": {"$gt": after_id}}, projection).sort("_id", 1)
+
+
+typeahead_index = TypeaheadIndex(
+    _load_typeahead_movies, normalize_query,
+    interval=TYPEAHEAD_REFRESH_INTERVAL, max_movies=TYPEAHEAD_MAX_MOVIES
+)
+
+
+def _load_movie_from_tmdb(movie_id):
+    """Fetch the raw movie payload from TMDB (cache loader)"""
+    return tmdb_client.get_movie(movie_id)
+
+
+# Imported catalog first (`flask import-catalog`), the live API only on a miss
+movie_details_cache = MovieDetailsCache(movie_details_cache_collection, _load_movie_from_tmdb, mirror=find_mirrored_movie)
+
+
+def fetch_movie_from_tmdb(movie_id):
+    """Return the raw TMDB movie payload, served from the mirror or detail cache when possible"""
+    return movie_details_cache.get(movie_id)
+
 
 def get_movie_details_from_tmdb(movie_id):
     """Fetch movie details from TMDB API"""
     try:
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={TMDB_API_KEY}&language=en-US"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        movie_data = response.json()
-        return {
-            "id": movie_data.get("id"),
-            "title": movie_data.get("title"),
-            "release_date": movie_data.get("release_date"),
-            "overview": movie_data.get("overview"),
-            "vote_average": round(movie_data.get("vote_average", 0), 1),
-            "vote_count": movie_data.get("vote_count"),
-            "poster_url": IMAGE_BASE + "w342" + movie_data.get("poster_path") if movie_data.get("poster_path") else None,
-        }
+        return TMDBClient.map_movie_summary(fetch_movie_from_tmdb(movie_id))
     except requests.RequestException as e:
         logger.error(f"Error fetching movie {movie_id}: {e}")
         return None
     
 
-def add_notification(movie_id, review_text, reviewer):
-    """Add notification to users who have movie in watchlist"""
+def get_movie_details_batch(movie_ids):
+    """
+    Fetch details for several movies concurrently.
+
+    Returns (movies, failed_ids); movies keeps the order of `movie_ids` and
+    simply leaves out any id whose fetch failed.
+    """
+    # Run each fetch in a copy of the request context so its TMDB/Mongo time
+    # still counts towards the request's slow-log breakdown
+    futures = [
+        (movie_id, detail_executor.submit(contextvars.copy_context().run, get_movie_details_from_tmdb, movie_id))
+        for movie_id in movie_ids
+    ]
+
+    movies = []
+    failed_ids = []
+    for movie_id, future in futures:
+        try:
+            movie_details = future.result()
+        except Exception as e:
+            logger.error(f"Error fetching movie {movie_id}: {e}")
+            movie_details = None
+        if movie_details:
+            movies.append(movie_details)
+        else:
+            failed_ids.append(movie_id)
+    return movies, failed_ids
+
+
+def parse_pagination(args, default_limit=DEFAULT_PAGE_SIZE, max_limit=MAX_PAGE_SIZE):
+    """Read offset/limit query params, clamped to sane bounds"""
     try:
-        users_cursor = user_collection.find(
-            {"watch_list": movie_id},
-            {"_id": 0, "username": 1}
+        offset = max(int(args.get("offset", 0)), 0)
+    except (TypeError, ValueError):
+        offset = 0
+    try:
+        limit = int(args.get("limit", default_limit))
+    except (TypeError, ValueError):
+        limit = default_limit
+    return offset, min(max(limit, 1), max_limit)
+
+
+def user_list_page_pipeline(username, field, offset, limit):
+    """Aggregation returning {ids, total, version} for one page of a user's `watched` or `watch_list` array"""
+    return [
+        {"$match": {"username": username}},
+        {"$project": {
+            "_id": 0,
+            "total": {"$size": {"$ifNull": [f"${field}", []]}},
+            "ids": {"$slice": [{"$ifNull": [f"${field}", []]}, offset, limit]},
+            "version": {"$ifNull": [f"$list_versions.{field}", 0]}
+        }}
+    ]
+
+
+def get_user_list_page(username, field, offset, limit):
+    """Return (ids, total, version) for one page of a user's `watched` or `watch_list` array"""
+    result = list(user_collection.aggregate(user_list_page_pipeline(username, field, offset, limit)))
+    if not result:
+        return [], 0, 0
+    return result[0]["ids"], result[0]["total"], result[0]["version"]
+
+
+def list_page_etag(username, field, version, offset, limit):
+    """ETag for one list page: bumps with the user's list version and the TMDB data behind the cards"""
+    return make_etag(field, username, version, offset, limit, tmdb_epoch())
+
+
+def movie_etag(movie_id, movie):
+    """ETag for /movie/<id>: bumps with each new review and with the mirror or cached TMDB data"""
+    movie = movie or {}
+    latest = movie.get("latest_reviews") or []
+    return make_etag(
+        "movie", movie_id, movie.get("review_count", 0), latest[0]["_id"] if latest else None,
+        movie.get("tmdb_synced_at"), tmdb_epoch()
+    )
+
+
+def movie_list_page(movies, failed_ids, offset, limit, page_size, total):
+    """JSON body for one page of a watch list / watched list"""
+    next_offset = offset + page_size
+    return {
+        "movies": movies,
+        "failed": failed_ids,
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "next_offset": next_offset if next_offset < total else None
+    }
+
+
+def paginated_movies_response(username, field, args, if_none_match=None):
+    """
+    Build (body, headers) for a paginated watch list / watched list request.
+
+    body is None when `if_none_match` shows the client already has this
+    page, in which case no movie details are fetched at all.
+    """
+    offset, limit = parse_pagination(args)
+    movie_ids, total, version = get_user_list_page(username, field, offset, limit)
+    etag = list_page_etag(username, field, version, offset, limit)
+    headers = cache_headers(etag, PRIVATE_REVALIDATE)
+    if etag_matches(if_none_match, etag):
+        return None, headers
+    movies, failed_ids = get_movie_details_batch(movie_ids)
+    return movie_list_page(movies, failed_ids, offset, limit, len(movie_ids), total), headers
+
+
+def user_summary(username, limit=DEFAULT_PAGE_SIZE, if_none_match=None):
+    """
+    Build (body, headers) for /api/me/summary: badge counts plus the first
+    page of both lists and of the notifications, from one projected read
+    of the user document (paged like user_list_page_pipeline). body is
+    None when `if_none_match` is current, and None, None when the user
+    doesn't exist.
+    """
+    result = list(user_collection.aggregate([
+        {"$match": {"username": username}},
+        {"$project": {
+            **USER_COUNTS_PROJECTION,
+            "list_versions": 1,
+            "notifications_version": 1,
+            **{f"{field}_page": {"$slice": [{"$ifNull": [f"${field}", []]}, 0, limit]} for field in LIST_FIELDS}
+        }}
+    ]))
+    if not result:
+        return None, None
+    user = result[0]
+
+    versions = user.get("list_versions", {})
+    etag = make_etag(
+        "summary", username, limit, versions.get("watch_list", 0), versions.get("watched", 0),
+        user.get("notifications_version", 0), tmdb_epoch(), int(time.time() // 86400)
+    )
+    headers = cache_headers(etag, PRIVATE_REVALIDATE)
+    if etag_matches(if_none_match, etag):
+        return None, headers
+
+    # One concurrent detail batch for both lists
+    page_ids = {field: user[f"{field}_page"] for field in LIST_FIELDS}
+    requested = list(dict.fromkeys(page_ids["watch_list"] + page_ids["watched"]))
+    movies, failed_ids = get_movie_details_batch(requested)
+    by_id = dict(zip([movie_id for movie_id in requested if movie_id not in failed_ids], movies))
+
+    body = {
+        "username": username,
+        "counts": {key: user[key] for key in ("watch_list", "watched", "unread_notifications")},
+        "notifications": list_notifications(username, None, limit)
+    }
+    for field, ids in page_ids.items():
+        body[field] = movie_list_page(
+            [by_id[movie_id] for movie_id in ids if movie_id in by_id],
+            [movie_id for movie_id in ids if movie_id not in by_id],
+            0, limit, len(ids), user[field]
         )
+    return body, headers
+
 
-        for user in users_cursor:
-            username = user["username"].lower()
-            # Don't notify the reviewer
-            if username == reviewer.lower():
-                continue
-                
-            notification = {
-                "movie_id": movie_id,
-                "reviewer": reviewer,
-                "text": review_text,
-                "date": datetime.utcnow().isoformat()
-            }
-
-            user_collection.update_one(
-                {"username": username},
-                {"$push": {"notifications": notification}}
-            )
+def add_notification(movie_id, review_text, reviewer):
+    """Queue a notification for users who have movie in watchlist"""
+    try:
+        enqueue_notification_job(movie_id, review_text, reviewer)
     except Exception as e:
         logger.error(f"Add notification error: {e}")
-
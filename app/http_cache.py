@@ -0,0 +1,34 @@
+import time
+import hashlib
+from .cache import MOVIE_CACHE_TTL
+
+
+# Clients may keep a copy but must revalidate it (cheaply, via If-None-Match) before reuse
+PRIVATE_REVALIDATE = "private, no-cache"
+PUBLIC_REVALIDATE = "public, no-cache"
+
+
+def make_etag(*parts):
+    """Strong ETag over the version inputs of a response"""
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:24] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """RFC 9110 If-None-Match check (weak comparison, as the spec requires for GET)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def cache_headers(etag, cache_control):
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def tmdb_epoch(now=None):
+    """
+    Changes once per movie cache TTL. Mixed into ETags of bodies built
+    from cached TMDB data, so clients pick up refreshed details no later
+    than the server does.
+    """
+    return int((now or time.time()) // MOVIE_CACHE_TTL)
@@ -0,0 +1,155 @@
+import os
+import re
+import time
+import logging
+import tempfile
+import threading
+import requests
+from .outbound import SingleFlight
+from .metrics import record_dependency
+from .tmdb_api import IMAGE_BASE, IMAGE_PROXY_BASE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "movie-tracker-images"))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_MB", "512")) * 1024 * 1024
+# The poster/backdrop sizes the templates and main.js ask for
+IMAGE_SIZES = {"w342", "w500", "w1280"}
+IMAGE_MAX_AGE = 365 * 24 * 3600
+
+_FILENAME = re.compile(r"^[A-Za-z0-9_-]+\.(jpg|jpeg|png|webp)$")
+
+
+class ImageNotFound(Exception):
+    pass
+
+
+def proxy_image_url(url):
+    """Point a stored TMDB image URL at the proxy (documents saved before it existed hold direct URLs)"""
+    if url and url.startswith(IMAGE_BASE):
+        return IMAGE_PROXY_BASE + url[len(IMAGE_BASE):]
+    return url
+
+
+class PosterCache:
+    """
+    Size-bounded on-disk cache of TMDB images.
+
+    Each image is downloaded once, written atomically (temp file +
+    rename) and then served from disk; a file's mtime is its last use, and
+    the least recently used files are deleted once the directory grows
+    past `max_bytes`. Concurrent misses for the same image in a process
+    share one download. The directory may be shared by every worker.
+    """
+
+    def __init__(self, directory=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES, timeout=(3.05, 15)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+
+    @property
+    def session(self):
+        if self._session is None or self._session_pid != os.getpid():
+            self._session = requests.Session()
+            self._session_pid = os.getpid()
+        return self._session
+
+    def _path(self, size, filename):
+        return os.path.join(self.directory, size, filename)
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _grow(self, nbytes):
+        with self._lock:
+            if self._size is None:
+                # First write in this process: the scan already includes the new file
+                self._size = sum(size for _, size, _ in self._files())
+            else:
+                self._size += nbytes
+            over = self._size > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used files down to 90% of the limit (rescans, so other workers' files count)"""
+        files = sorted(self._files(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+        logger.info(f"Image cache evicted {removed} files, {total / 1024 / 1024:.0f} MB left")
+
+    def _download(self, size, filename, path):
+        started = time.perf_counter()
+        try:
+            response = self.session.get(f"{IMAGE_BASE}{size}/{filename}", timeout=self.timeout)
+        finally:
+            record_dependency("tmdb_images", time.perf_counter() - started)
+        if response.status_code == 404:
+            raise ImageNotFound(f"{size}/{filename}")
+        response.raise_for_status()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(response.content)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._grow(len(response.content))
+        return path
+
+    def get(self, size, filename):
+        """Local path of the image, downloading it on a miss; raises ImageNotFound or requests errors"""
+        if size not in IMAGE_SIZES or not _FILENAME.match(filename):
+            raise ImageNotFound(f"{size}/{filename}")
+        path = self._path(size, filename)
+        try:
+            os.utime(path)
+            self.hits += 1
+            return path
+        except FileNotFoundError:
+            pass
+        self.misses += 1
+        return self.single_flight.do((size, filename), self._download, size, filename, path)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.single_flight.coalesced,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+poster_cache = PosterCache()
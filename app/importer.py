@@ -0,0 +1,203 @@
+import io
+import re
+import csv
+import json
+import logging
+from datetime import datetime
+from .database import *
+from .users import apply_list_changes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+IMPORT_BATCH_SIZE = 500
+# Collation the movies.title index is built with: ignores case and accents
+TITLE_COLLATION = {"locale": "en", "strength": 1}
+
+# Column names seen in other services' exports (Letterboxd, IMDb, Trakt, ...)
+ID_KEYS = ("tmdb_id", "tmdbid", "tmdb", "movie_id", "id")
+TITLE_KEYS = ("title", "name", "movie", "original_title")
+YEAR_KEYS = ("year", "release_year", "release_date")
+
+
+# --------------------- Parsing --------------------- #
+def _pick(row, keys):
+    for key in keys:
+        value = row.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _normalize_row(row):
+    """Reduce one exported entry to {tmdb_id, title, year}; None if it names no movie"""
+    if isinstance(row.get("movie"), dict):
+        # Trakt-style {"movie": {"title", "year", "ids": {"tmdb"}}}
+        movie = row["movie"]
+        row = {**movie, "tmdb_id": (movie.get("ids") or {}).get("tmdb")}
+    # "Release Date", "release-date" and "release_date" are the same column
+    row = {re.sub(r"[\s-]+", "_", str(key).strip().lower()): value for key, value in row.items()}
+
+    try:
+        tmdb_id = int(_pick(row, ID_KEYS))
+    except (TypeError, ValueError):
+        tmdb_id = None
+    title = _pick(row, TITLE_KEYS)
+    title = str(title).strip() if isinstance(title, (str, int)) else None
+    try:
+        year = int(str(_pick(row, YEAR_KEYS))[:4])
+    except (TypeError, ValueError):
+        year = None
+
+    if tmdb_id is None and not title:
+        return None
+    return {"tmdb_id": tmdb_id, "title": title, "year": year}
+
+
+def iter_json_values(text, chunk_size=64 * 1024):
+    """
+    Yield the objects of a JSON array, or of JSON-lines input, while reading
+    only `chunk_size` characters at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    while True:
+        stripped = buffer.lstrip(" \t\r\n,[")
+        if stripped.startswith("]"):
+            stripped = stripped[1:]
+        buffer = stripped
+        if buffer:
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                yield value
+                buffer = buffer[end:]
+                continue
+        elif eof:
+            return
+        chunk = text.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_import_rows(stream, filename=""):
+    """Stream normalized rows out of an uploaded CSV or JSON/JSON-lines export"""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    is_json = filename.lower().endswith((".json", ".jsonl", ".ndjson"))
+    values = iter_json_values(text) if is_json else csv.DictReader(text)
+    for value in values:
+        row = _normalize_row(value) if isinstance(value, dict) else None
+        if row:
+            yield row
+        elif is_json and isinstance(value, dict):
+            # e.g. {"movies": [...]}: the whole export wrapped in an object, which would import nothing
+            wrapped = [key for key, item in value.items() if isinstance(item, list)]
+            if wrapped:
+                raise ValueError(f"expected a list of movies, not an object holding '{wrapped[0]}'")
+
+
+# --------------------- Resolving titles --------------------- #
+def _year(movie):
+    try:
+        return int((movie.get("release_date") or "")[:4])
+    except ValueError:
+        return None
+
+
+def _best_match(candidates, year):
+    """Prefer a release year within one of the exported year, then the most voted"""
+    if year:
+        dated = [movie for movie in candidates if _year(movie) and abs(_year(movie) - year) <= 1]
+        candidates = dated or candidates
+    return max(candidates, key=lambda movie: movie.get("vote_count") or 0, default=None)
+
+
+def resolve_titles(rows, normalize):
+    """
+    Fill in `tmdb_id` for rows that only carry a title.
+
+    One collated $in query against the local catalog covers the whole
+    batch; titles it doesn't know are looked up in the search cache
+    (normalized query -> movie ids) with one more query. Nothing here
+    calls TMDB.
+    """
+    pending = [row for row in rows if row["tmdb_id"] is None]
+    if not pending:
+        return rows
+
+    by_title = {}
+    movies = movie_collection.find(
+        {"title": {"$in": list({row["title"] for row in pending})}},
+        {"_id": 0, "id": 1, "title": 1, "release_date": 1, "vote_count": 1}
+    ).collation(TITLE_COLLATION)
+    for movie in movies:
+        by_title.setdefault(normalize(movie["title"]), []).append(movie)
+
+    unresolved = []
+    for row in pending:
+        match = _best_match(by_title.get(normalize(row["title"]), []), row["year"])
+        if match:
+            row["tmdb_id"] = match["id"]
+        else:
+            unresolved.append(row)
+    if not unresolved:
+        return rows
+
+    cached = search_cache_collection.find(
+        {"query": {"$in": list({normalize(row["title"]) for row in unresolved})}, "page": 1,
+         "expires_at": {"$gt": datetime.utcnow()}},
+        {"_id": 0, "query": 1, "movie_ids": 1}
+    )
+    results = {doc["query"]: doc.get("movie_ids", [])[:5] for doc in cached}
+    candidate_ids = list({movie_id for ids in results.values() for movie_id in ids})
+    candidates = {
+        movie["id"]: movie
+        for movie in movie_collection.find({"id": {"$in": candidate_ids}}, {"_id": 0, "id": 1, "release_date": 1, "vote_count": 1})
+    }
+    for row in unresolved:
+        options = [candidates[movie_id] for movie_id in results.get(normalize(row["title"]), []) if movie_id in candidates]
+        # Search results are already relevance-ordered: take the first one in the right year
+        if row["year"]:
+            options = [movie for movie in options if _year(movie) and abs(_year(movie) - row["year"]) <= 1]
+        if options:
+            row["tmdb_id"] = options[0]["id"]
+    return rows
+
+
+# --------------------- Import --------------------- #
+def import_user_list(username, field, rows, normalize, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Add imported movies to one of the user's lists, `batch_size` rows at a
+    time. Yields a progress dict after each batch; the last one is final.
+    """
+    progress = {"processed": 0, "matched": 0, "unresolved": 0, "unresolved_titles": [], "counts": None}
+    batch = []
+
+    def flush():
+        resolve_titles(batch, normalize)
+        ids = [row["tmdb_id"] for row in batch if row["tmdb_id"] is not None]
+        missing = [row for row in batch if row["tmdb_id"] is None]
+        user = apply_list_changes(username, add={field: ids}) if ids else None
+        progress["processed"] += len(batch)
+        progress["matched"] += len(ids)
+        progress["unresolved"] += len(missing)
+        # Enough for the user to see what to add by hand, without an unbounded response
+        room = 50 - len(progress["unresolved_titles"])
+        progress["unresolved_titles"] += [row["title"] for row in missing[:max(room, 0)]]
+        if user:
+            progress["counts"] = user.get("counts")
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+            yield dict(progress, done=False)
+    if batch:
+        flush()
+    yield dict(progress, done=True)
@@ -0,0 +1,121 @@
+import logging
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import PyMongoError
+from .database import *
+from .notifications import NOTIFICATION_RETENTION_DAYS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Unique indexes that existing data may violate; `flask migrate-catalog`
+# deduplicates first and then builds them
+UNIQUE_INDEXES = [
+    ("users", [("username", ASCENDING)]),
+    ("movies", [("id", ASCENDING)]),
+]
+
+
+def _find_index(collection, keys):
+    for name, spec in collection.index_information().items():
+        if spec["key"] == keys:
+            return name, spec
+    return None, None
+
+
+def _ensure_lookup_index(collection, keys):
+    """Create a plain index on `keys` unless one (unique or not) already exists"""
+    name, _ = _find_index(collection, keys)
+    if name is None:
+        collection.create_index(keys)
+
+
+class DuplicateKeysError(Exception):
+    """Existing documents share a value that a unique index would forbid"""
+
+    def __init__(self, collection_name, duplicates):
+        self.duplicates = duplicates
+        values = ", ".join(f"{dup['_id']} (x{dup['count']})" for dup in duplicates)
+        super().__init__(f"duplicate values in {collection_name}: {values}")
+
+
+def find_duplicates(collection, keys, limit=10):
+    """Up to `limit` key values held by more than one document, with their counts"""
+    return list(collection.aggregate([
+        {"$group": {"_id": {key: f"${key}" for key, _ in keys}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit}
+    ], allowDiskUse=True))
+
+
+def ensure_unique_index(collection, keys):
+    """
+    Make the index on `keys` unique; returns True if anything changed.
+
+    Raises DuplicateKeysError, before touching any index, if existing
+    documents would violate it. A plain index is converted in place
+    (MongoDB 6.0+), so lookups stay indexed throughout; on older servers
+    it is dropped and rebuilt, and restored if the unique build fails.
+    """
+    name, spec = _find_index(collection, keys)
+    if spec and spec.get("unique"):
+        return False
+    duplicates = find_duplicates(collection, keys)
+    if duplicates:
+        raise DuplicateKeysError(collection.name, duplicates)
+    if name is None:
+        collection.create_index(keys, unique=True)
+        return True
+
+    if collection.database.client.server_info()["versionArray"][:2] >= [6, 0]:
+        # prepareUnique rejects new duplicates first, so the conversion can't race with inserts
+        collection.database.command("collMod", collection.name, index={"name": name, "prepareUnique": True})
+        collection.database.command("collMod", collection.name, index={"name": name, "unique": True})
+        return True
+
+    collection.drop_index(name)
+    try:
+        collection.create_index(keys, unique=True)
+    except PyMongoError:
+        # Never leave the live app without its lookup index
+        collection.create_index(keys, name=name)
+        raise
+    return True
+
+
+def ensure_indexes():
+    """Create the indexes the app's queries rely on (idempotent)"""
+    try:
+        for collection_name, keys in UNIQUE_INDEXES:
+            _ensure_lookup_index(db[collection_name], keys)
+        user_collection.create_index([("watch_list", ASCENDING), ("_id", ASCENDING)])
+        user_collection.create_index("lists_updated_at", sparse=True)
+        search_cache_collection.create_index([("query", ASCENDING), ("page", ASCENDING)], unique=True)
+        search_cache_collection.create_index("expires_at", expireAfterSeconds=0)
+        notification_jobs_collection.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+        notification_jobs_collection.create_index("finished_at", expireAfterSeconds=7 * 24 * 3600)
+        notification_collection.create_index([("username", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)])
+        # One notification per user per job, so a redone fan-out batch can't deliver twice
+        notification_collection.create_index(
+            [("job_id", ASCENDING), ("username", ASCENDING)],
+            unique=True, partialFilterExpression={"job_id": {"$exists": True}}
+        )
+        notification_collection.create_index("date", expireAfterSeconds=NOTIFICATION_RETENTION_DAYS * 24 * 3600)
+        review_collection.create_index([("movie_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)])
+        # Case/accent-insensitive title lookups for list imports (importer.TITLE_COLLATION)
+        movie_collection.create_index("title", collation={"locale": "en", "strength": 1}, name="title_collated")
+        # Typeahead's initial load walks the most voted movies instead of sorting the catalog
+        movie_collection.create_index([("vote_count", DESCENDING)])
+    except PyMongoError as e:
+        logger.error(f"Index creation error: {e}")
+
+    # Separate, since a collection holds one text index and an older definition makes this fail
+    try:
+        movie_collection.create_index(
+            [("title", TEXT), ("original_title", TEXT), ("overview", TEXT)],
+            weights={"title": 10, "original_title": 5, "overview": 1},
+            default_language="english",
+            name="movie_text"
+        )
+    except PyMongoError as e:
+        logger.error(f"Text index creation error: {e}")
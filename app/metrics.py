@@ -0,0 +1,199 @@
+import os
+import re
+import logging
+import threading
+import contextvars
+from pymongo import monitoring
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Requests slower than this are logged with a per-dependency breakdown (0 = off)
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "1000"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    labels = _format_labels(self.labels, label_values, [("le", bound)])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Metrics are per worker process; scrape each worker (or run one) for totals
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")))
+http_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+tmdb_duration = registry.register(Histogram(
+    "tmdb_request_duration_seconds", "Outbound TMDB request latency", ("endpoint",)))
+tmdb_errors = registry.register(Counter(
+    "tmdb_errors_total", "Failed outbound TMDB requests", ("endpoint", "reason")))
+mongo_duration = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ("collection", "command")))
+mongo_errors = registry.register(Counter(
+    "mongodb_command_errors_total", "Failed MongoDB commands", ("collection", "command")))
+
+
+# --------------------- Per-request dependency breakdown --------------------- #
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request_timing():
+    _request_timings.set({})
+
+
+def record_dependency(name, seconds):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def finish_request(method, route, status, seconds, path=None):
+    """Record a handled request and log it if it was slow"""
+    http_requests.inc(method, route, status)
+    http_duration.observe(seconds, method, route)
+    timings = _request_timings.get() or {}
+    _request_timings.set(None)
+    if SLOW_REQUEST_MS and seconds * 1000 >= SLOW_REQUEST_MS:
+        # Dependency times are summed over calls, so concurrent fetches can add up to more than the wall time
+        breakdown = ", ".join(f"{name}={value * 1000:.0f}ms" for name, value in sorted(timings.items()))
+        other = max(seconds - sum(timings.values()), 0)
+        logger.warning(
+            f"Slow request {method} {path or route} -> {status} in {seconds * 1000:.0f}ms "
+            f"({breakdown + ', ' if breakdown else ''}other={other * 1000:.0f}ms)"
+        )
+
+
+# --------------------- TMDB --------------------- #
+_NUMERIC_SEGMENT = re.compile(r"/\d+")
+
+
+def tmdb_endpoint(path):
+    """Collapse ids so /movie/603 and /movie/550 share one label"""
+    return _NUMERIC_SEGMENT.sub("/{id}", path)
+
+
+def observe_tmdb(path, seconds, error=None):
+    endpoint = tmdb_endpoint(path)
+    tmdb_duration.observe(seconds, endpoint)
+    record_dependency("tmdb", seconds)
+    if error is not None:
+        tmdb_errors.inc(endpoint, error)
+
+
+# --------------------- MongoDB --------------------- #
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command by collection and command name"""
+
+    def __init__(self):
+        # Only the collection name is kept; pymongo measures the duration itself
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "-"
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is None:
+            return None
+        seconds = event.duration_micros / 1e6
+        mongo_duration.observe(seconds, collection, event.command_name)
+        record_dependency("mongodb", seconds)
+        return collection
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        if collection is not None:
+            mongo_errors.inc(collection, event.command_name)
+
+
+def render_metrics():
+    return registry.render()
@@ -0,0 +1,258 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne, ReturnDocument, DESCENDING
+from pymongo.errors import BulkWriteError
+from .database import *
+from .pagination import encode_cursor, keyset_filter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+NOTIFICATION_BATCH_SIZE = int(os.environ.get("NOTIFICATION_BATCH_SIZE", "500"))
+NOTIFICATION_POLL_INTERVAL = float(os.environ.get("NOTIFICATION_POLL_INTERVAL", "2"))
+NOTIFICATION_LEASE_SECONDS = 300
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get("NOTIFICATION_RETENTION_DAYS", "30"))
+NOTIFICATION_PAGE_SIZE = 20
+
+_wakeup = threading.Event()
+_worker_thread = None
+_worker_pid = None
+
+
+# --------------------- Queue --------------------- #
+def enqueue_notification_job(movie_id, review_text, reviewer):
+    """Queue a review for fan-out to everyone with the movie in their watch list"""
+    notification_jobs_collection.insert_one({
+        "movie_id": movie_id,
+        "reviewer": reviewer,
+        "text": review_text,
+        "date": datetime.utcnow(),
+        "status": "pending",
+        "attempts": 0,
+        "last_follower_id": None,
+        "created_at": datetime.utcnow()
+    })
+    _wakeup.set()
+
+
+def claim_notification_job():
+    """Atomically lease the oldest pending job (or one whose lease has run out)"""
+    now = datetime.utcnow()
+    return notification_jobs_collection.find_one_and_update(
+        {"$or": [
+            {"status": "pending"},
+            {"status": "running", "locked_until": {"$lt": now}}
+        ]},
+        {
+            "$set": {"status": "running", "locked_until": now + timedelta(seconds=NOTIFICATION_LEASE_SECONDS)},
+            "$inc": {"attempts": 1}
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+# --------------------- Fan-out --------------------- #
+def _flush(job, notification, usernames, last_follower_id):
+    """
+    Deliver one batch. (job_id, username) is unique, so a batch redone after
+    a crash or an expired lease skips the notifications that already went
+    out, and only users who actually got a new one have their counter bumped.
+    """
+    docs = [{"job_id": job["_id"], "username": username, **notification} for username in usernames]
+    try:
+        notification_collection.insert_many(docs, ordered=False)
+        delivered = usernames
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != 11000 for error in errors):
+            raise
+        duplicates = {error["index"] for error in errors}
+        delivered = [username for i, username in enumerate(usernames) if i not in duplicates]
+    if delivered:
+        user_collection.bulk_write(
+            [
+                UpdateOne({"username": username}, {"$inc": {"unread_notifications": 1, "notifications_version": 1}})
+                for username in delivered
+            ],
+            ordered=False
+        )
+    # Checkpoint so a crashed job resumes after the last delivered batch
+    notification_jobs_collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {
+            "last_follower_id": last_follower_id,
+            "locked_until": datetime.utcnow() + timedelta(seconds=NOTIFICATION_LEASE_SECONDS)
+        }}
+    )
+    return len(delivered)
+
+
+def process_notification_job(job, batch_size=NOTIFICATION_BATCH_SIZE):
+    """Write the job's notification for every follower in bulk batches"""
+    notification = {
+        "movie_id": job["movie_id"],
+        "reviewer": job["reviewer"],
+        "text": job["text"],
+        "date": job["date"]
+    }
+    query = {"watch_list": job["movie_id"], "username": {"$ne": job["reviewer"].lower()}}
+    if job.get("last_follower_id") is not None:
+        query["_id"] = {"$gt": job["last_follower_id"]}
+
+    followers = user_collection.find(query, {"_id": 1, "username": 1}).sort("_id", 1).batch_size(batch_size)
+
+    usernames = []
+    delivered = 0
+    for user in followers:
+        usernames.append(user["username"])
+        if len(usernames) >= batch_size:
+            delivered += _flush(job, notification, usernames, user["_id"])
+            usernames = []
+    if usernames:
+        delivered += _flush(job, notification, usernames, user["_id"])
+
+    notification_jobs_collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": "done", "finished_at": datetime.utcnow()}, "$unset": {"locked_until": ""}}
+    )
+    return delivered
+
+
+# --------------------- Reading & acknowledging --------------------- #
+def _serialize_notification(notification):
+    return {
+        "id": str(notification["_id"]),
+        "movie_id": notification.get("movie_id"),
+        "reviewer": notification.get("reviewer"),
+        "text": notification.get("text"),
+        "date": notification["date"].isoformat()
+    }
+
+
+def list_notifications(username, cursor=None, limit=NOTIFICATION_PAGE_SIZE):
+    """
+    Return one page of a user's notifications, newest first.
+
+    Pages are keyed on (date, _id) so each request is an index range scan
+    of `limit` entries no matter how long the user's history is.
+    """
+    query = {"username": username}
+    if cursor:
+        query.update(keyset_filter(cursor))
+
+    page = list(
+        notification_collection.find(query)
+        .sort([("date", DESCENDING), ("_id", DESCENDING)])
+        .limit(limit + 1)
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    return {
+        "notifications": [_serialize_notification(n) for n in page],
+        "next_cursor": encode_cursor(page[-1]["date"], page[-1]["_id"]) if has_more else None
+    }
+
+
+def notifications_version(username):
+    """Counter bumped whenever a notification is delivered to or removed for `username`"""
+    user = user_collection.find_one({"username": username}, {"_id": 0, "notifications_version": 1})
+    return (user or {}).get("notifications_version", 0)
+
+
+def acknowledge_notification(username, notification_id):
+    """Delete one notification by id; returns False if it was not found"""
+    try:
+        notification_id = ObjectId(notification_id)
+    except (InvalidId, TypeError):
+        return False
+    result = notification_collection.delete_one({"_id": notification_id, "username": username})
+    if result.deleted_count:
+        # One pipeline update: decrement without going below zero and bump the version
+        user_collection.update_one({"username": username}, [{"$set": {
+            "unread_notifications": {"$max": [{"$subtract": [{"$ifNull": ["$unread_notifications", 0]}, 1]}, 0]},
+            "notifications_version": {"$add": [{"$ifNull": ["$notifications_version", 0]}, 1]}
+        }}])
+        return True
+    return False
+
+
+def recount_unread_notifications(users):
+    """
+    Correct the unread counters of a batch of user documents
+    ({_id, username, notifications_version}) from the notifications
+    collection, e.g. after the retention TTL removed some. A user whose
+    version moved since it was read got a delivery or acknowledgement
+    meanwhile and is left for the next run. Returns how many were fixed.
+    """
+    counts = {
+        row["_id"]: row["count"]
+        for row in notification_collection.aggregate([
+            {"$match": {"username": {"$in": [user["username"] for user in users]}}},
+            {"$group": {"_id": "$username", "count": {"$sum": 1}}}
+        ])
+    }
+    operations = []
+    for user in users:
+        version = user.get("notifications_version")
+        operations.append(UpdateOne(
+            {
+                "_id": user["_id"],
+                "notifications_version": version if version is not None else {"$exists": False},
+                "unread_notifications": {"$ne": counts.get(user["username"], 0)}
+            },
+            {"$set": {"unread_notifications": counts.get(user["username"], 0)}, "$inc": {"notifications_version": 1}}
+        ))
+    if not operations:
+        return 0
+    return user_collection.bulk_write(operations, ordered=False).modified_count
+
+
+# --------------------- Worker --------------------- #
+def run_notification_worker(stop_event=None, batch_size=NOTIFICATION_BATCH_SIZE):
+    """Process queued jobs until `stop_event` is set"""
+    stop_event = stop_event or threading.Event()
+    logger.info("Notification worker started")
+    while not stop_event.is_set():
+        try:
+            job = claim_notification_job()
+        except Exception as e:
+            logger.error(f"Notification queue error: {e}")
+            time.sleep(NOTIFICATION_POLL_INTERVAL)
+            continue
+
+        if job is None:
+            _wakeup.wait(NOTIFICATION_POLL_INTERVAL)
+            _wakeup.clear()
+            continue
+
+        try:
+            start = time.monotonic()
+            delivered = process_notification_job(job, batch_size)
+            logger.info(f"Delivered {delivered} notifications for movie {job['movie_id']} in {time.monotonic() - start:.2f}s")
+        except Exception as e:
+            logger.error(f"Notification job {job['_id']} failed: {e}")
+            status = "failed" if job["attempts"] >= NOTIFICATION_MAX_ATTEMPTS else "pending"
+            notification_jobs_collection.update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": status, "error": str(e)}, "$unset": {"locked_until": ""}}
+            )
+
+
+def start_notification_worker():
+    """Run the worker on a daemon thread in this process (once per forked worker)"""
+    global _worker_thread, _worker_pid
+    if _worker_thread is not None and _worker_thread.is_alive() and _worker_pid == os.getpid():
+        return _worker_thread
+    _worker_thread = threading.Thread(target=run_notification_worker, name="notification-worker", daemon=True)
+    _worker_thread.start()
+    _worker_pid = os.getpid()
+    return _worker_thread
@@ -0,0 +1,26 @@
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+# Keyset cursors for feeds sorted by (date desc, _id desc)
+def encode_cursor(date, object_id):
+    return f"{date.isoformat()}_{object_id}"
+
+
+def decode_cursor(cursor):
+    """Parse a cursor from `encode_cursor`; raises ValueError if it is malformed"""
+    date, _, object_id = cursor.rpartition("_")
+    try:
+        return datetime.fromisoformat(date), ObjectId(object_id)
+    except (InvalidId, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_filter(cursor, field="date"):
+    """Mongo filter selecting documents strictly after `cursor` in (field desc, _id desc) order"""
+    date, object_id = decode_cursor(cursor)
+    return {"$or": [
+        {field: {"$lt": date}},
+        {field: date, "_id": {"$lt": object_id}}
+    ]}
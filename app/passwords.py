@@ -0,0 +1,103 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+BCRYPT_POOL_SIZE = int(os.environ.get("BCRYPT_POOL_SIZE", "2"))
+BCRYPT_MAX_QUEUE = int(os.environ.get("BCRYPT_MAX_QUEUE", "16"))
+BCRYPT_TIMEOUT = float(os.environ.get("BCRYPT_TIMEOUT", "10"))
+BCRYPT_RETRY_AFTER = 2
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool already has BCRYPT_MAX_QUEUE jobs outstanding"""
+
+
+# These run in the pool's child processes
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small process pool so hashing never holds the GIL of a
+    web worker. At most `max_queue` jobs may be outstanding; beyond that
+    callers get PasswordHasherBusy immediately instead of queueing.
+    """
+
+    def __init__(self, pool_size=BCRYPT_POOL_SIZE, max_queue=BCRYPT_MAX_QUEUE, rounds=BCRYPT_ROUNDS):
+        self.pool_size = pool_size
+        self.rounds = rounds
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    @property
+    def executor(self):
+        # Built after fork, with spawned children so they don't inherit
+        # the web worker's threads or sockets. Spawned children re-import
+        # the __main__ script as __mp_main__, so entry scripts must not
+        # create the app in that case (see main.py)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password):
+        return self._submit(_hashpw, password, self.rounds).result(timeout=BCRYPT_TIMEOUT)
+
+    def check(self, password, hashed):
+        return self._submit(_checkpw, password, hashed).result(timeout=BCRYPT_TIMEOUT)
+
+    def needs_rehash(self, hashed):
+        """True if `hashed` was made with a different cost factor than the target"""
+        try:
+            return int(hashed.split(b"$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def rehash_later(self, password, on_done):
+        """Hash `password` at the target cost in the background and pass the result to `on_done`"""
+        try:
+            future = self._submit(_hashpw, password, self.rounds)
+        except PasswordHasherBusy:
+            return False
+
+        def callback(future):
+            try:
+                on_done(future.result())
+            except Exception as e:
+                logger.error(f"Password rehash error: {e}")
+
+        future.add_done_callback(callback)
+        return True
+
+
+password_hasher = PasswordHasher()
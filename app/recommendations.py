@@ -0,0 +1,63 @@
+import os
+import logging
+from .database import *
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Watching a movie says more about taste than planning to
+LIST_WEIGHTS = {"watched": 1.0, "watch_list": 0.5}
+# Most recent entries of each list used as seeds for one user's recommendations
+RECOMMENDATION_SEEDS = int(os.environ.get("RECOMMENDATION_SEEDS", "100"))
+
+
+def _movie_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def recommend_movie_ids(username, limit=20):
+    """
+    "People who watched this also watched": movie ids ranked for `username`.
+
+    Sums the precomputed neighbour scores (`flask build-recommendations`)
+    of the user's most recent list entries, then drops anything already
+    on a list. Three indexed queries, no arrays shipped beyond the seeds.
+    Returns [] when the user has no lists or no neighbours are built yet.
+    """
+    user = user_collection.find_one(
+        {"username": username},
+        {"_id": 0, **{field: {"$slice": -RECOMMENDATION_SEEDS} for field in LIST_WEIGHTS}}
+    )
+    if not user:
+        return []
+
+    seeds = {}
+    for field, weight in LIST_WEIGHTS.items():
+        for movie_id in map(_movie_id, user.get(field) or []):
+            if movie_id is not None:
+                seeds[movie_id] = max(seeds.get(movie_id, 0), weight)
+    if not seeds:
+        return []
+
+    scores = {}
+    for doc in movie_neighbors_collection.find({"_id": {"$in": list(seeds)}}, {"neighbors": 1}):
+        weight = seeds[doc["_id"]]
+        for neighbor in doc.get("neighbors", []):
+            scores[neighbor["id"]] = scores.get(neighbor["id"], 0) + weight * neighbor["score"]
+    for movie_id in seeds:
+        scores.pop(movie_id, None)
+    if not scores:
+        return []
+
+    # Older list entries weren't seeds, so check the best candidates against the full lists on the server
+    candidates = sorted(scores, key=scores.get, reverse=True)[:limit * 3]
+    known = user_collection.find_one({"username": username}, {"_id": 0, "known": {"$setIntersection": [
+        {"$literal": candidates},
+        {"$concatArrays": [{"$ifNull": [f"${field}", []]} for field in LIST_WEIGHTS]}
+    ]}})
+    known = set((known or {}).get("known") or [])
+    return [movie_id for movie_id in candidates if movie_id not in known][:limit]
@@ -0,0 +1,105 @@
+import os
+import logging
+from datetime import datetime
+from pymongo import DESCENDING
+from .database import *
+from .pagination import encode_cursor, keyset_filter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+REVIEW_PAGE_SIZE = 10
+# How many of the newest reviews are kept inline on the movie document
+REVIEW_SUMMARY_SIZE = int(os.environ.get("REVIEW_SUMMARY_SIZE", "5"))
+REVIEW_SUMMARY_PROJECTION = {"_id": 0, "review_count": 1, "latest_reviews": 1}
+# Plus what movie ETags depend on
+MOVIE_VERSION_PROJECTION = {**REVIEW_SUMMARY_PROJECTION, "tmdb_synced_at": 1}
+REVIEW_SORT = [("date", DESCENDING), ("_id", DESCENDING)]
+
+
+def serialize_review(review):
+    return {
+        "id": str(review["_id"]),
+        "username": review.get("username"),
+        "reviewText": review.get("reviewText"),
+        "date": review["date"].strftime("%Y-%m-%d")
+    }
+
+
+def add_review(movie_id, username, review_text):
+    """Store a review and refresh the count and latest-N summary on the movie document"""
+    review = {
+        "movie_id": movie_id,
+        "username": username,
+        "reviewText": review_text,
+        "date": datetime.utcnow()
+    }
+    review["_id"] = review_collection.insert_one(review).inserted_id
+
+    movie_collection.update_one(
+        {"id": movie_id},
+        {
+            "$inc": {"review_count": 1},
+            "$push": {"latest_reviews": {
+                "$each": [review],
+                "$sort": {"date": -1, "_id": -1},
+                "$slice": REVIEW_SUMMARY_SIZE
+            }}
+        },
+        upsert=True
+    )
+    return review
+
+
+def refresh_review_summary(movie_id):
+    """Recompute review_count and latest_reviews for a movie from the reviews collection"""
+    latest = list(
+        review_collection.find({"movie_id": movie_id})
+        .sort(REVIEW_SORT)
+        .limit(REVIEW_SUMMARY_SIZE)
+    )
+    movie_collection.update_one(
+        {"id": movie_id},
+        {"$set": {
+            "review_count": review_collection.count_documents({"movie_id": movie_id}),
+            "latest_reviews": latest
+        }},
+        upsert=True
+    )
+
+
+def review_summary(movie):
+    """(review_count, first page of reviews, next_cursor) from a movie document's summary fields"""
+    movie = movie or {}
+    latest = movie.get("latest_reviews", [])
+    review_count = movie.get("review_count", 0)
+    next_cursor = encode_cursor(latest[-1]["date"], latest[-1]["_id"]) if latest and review_count > len(latest) else None
+    return review_count, [serialize_review(r) for r in latest], next_cursor
+
+
+def reviews_query(movie_id, cursor=None):
+    query = {"movie_id": movie_id}
+    if cursor:
+        query.update(keyset_filter(cursor))
+    return query
+
+
+def review_page(page, limit):
+    """JSON body for a page fetched with limit + 1 documents"""
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        "reviews": [serialize_review(r) for r in page],
+        "next_cursor": encode_cursor(page[-1]["date"], page[-1]["_id"]) if has_more else None
+    }
+
+
+def list_reviews(movie_id, cursor=None, limit=REVIEW_PAGE_SIZE):
+    """Return one keyset-paginated page of a movie's reviews, newest first"""
+    page = list(
+        review_collection.find(reviews_query(movie_id, cursor))
+        .sort(REVIEW_SORT)
+        .limit(limit + 1)
+    )
+    return review_page(page, limit)
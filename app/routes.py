@@ -1,9 +1,19 @@
+import csv
+import json
+import time
+import mimetypes
 import logging
-import bcrypt
 import requests
 from dotenv import load_dotenv
+from flask import Blueprint, render_template, request, session, redirect, url_for, jsonify, send_file, Response, stream_with_context
+from pymongo import ReturnDocument
 from .helper_functions import *
-from flask import Blueprint, render_template, request, session, redirect, url_for,jsonify
+from .passwords import password_hasher, PasswordHasherBusy, BCRYPT_RETRY_AFTER
+from .metrics import render_metrics
+from .http_cache import PUBLIC_REVALIDATE
+from .images import poster_cache, proxy_image_url, ImageNotFound, IMAGE_MAX_AGE
+from .assets import asset_manifest, ASSET_MAX_AGE
+from .importer import iter_import_rows, import_user_list
 
 
 
@@ -16,21 +26,76 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-IMAGE_BASE = "https://image.tmdb.org/t/p/"
-
-
 @main_routes.route('/health')
 def health_check():
     """Health check endpoint for Render"""
+    # Answered from pymongo's background heartbeats, no round trip per probe
+    status = database.health()
+    body = {
+        "status": "healthy" if status["healthy"] else "unhealthy",
+        "database": status["database"],
+        "movie_cache": movie_details_cache.stats(),
+        "tmdb": tmdb_client.stats(),
+        "image_cache": poster_cache.stats()
+    }
+    if not status["healthy"]:
+        body["error"] = status.get("error")
+        return jsonify(body), 503
+    return jsonify(body), 200
+
+
+
+@main_routes.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint for this worker process"""
+    return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+
+
+@main_routes.route('/images/<size>/<filename>')
+def movie_image(size, filename):
+    """TMDB poster/backdrop, fetched once and then served from the on-disk cache"""
     try:
-        # Test MongoDB connection
-        client.admin.command('ping')
-        return jsonify({"status": "healthy", "database": "connected"}), 200
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return jsonify({"status": "unhealthy", "error": str(e)}), 503
+        path = poster_cache.get(size, filename)
+    except ImageNotFound:
+        return jsonify({"error": "Image not found"}), 404
+    except (requests.RequestException, OSError) as e:
+        logger.error(f"Image fetch error for {size}/{filename}: {e}")
+        return jsonify({"error": "Image unavailable"}), 502
+
+    # TMDB never changes the file behind an image path, so browsers may keep it forever
+    response = send_file(path, max_age=IMAGE_MAX_AGE, conditional=True)
+    response.headers["Cache-Control"] = f"public, max-age={IMAGE_MAX_AGE}, immutable"
+    return response
 
 
+@main_routes.app_template_filter("image")
+def image_filter(url):
+    return proxy_image_url(url)
+
+
+@main_routes.route('/assets/<filename>')
+def static_asset(filename):
+    """Fingerprinted static file, precompressed variant when the client accepts one"""
+    try:
+        path, encoding = asset_manifest.resolve(filename, request.headers.get("Accept-Encoding"))
+    except KeyError:
+        return jsonify({"error": "Asset not found"}), 404
+
+    # The name changes with the content, so browsers never need to revalidate
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    response = send_file(path, mimetype=mimetype, max_age=ASSET_MAX_AGE, conditional=True)
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+@main_routes.app_template_global("asset_url")
+def asset_url(filename):
+    return asset_manifest.url(filename)
 
 
 @main_routes.route('/', methods=['GET','POST'])
@@ -45,13 +110,22 @@ def login_page():
             return render_template("login_page.html", error=error)
 
         try:
-            user = user_collection.find_one({"username": username})
-            if user and bcrypt.checkpw(password, user["password_hash"]):
+            user = user_collection.find_one({"username": username}, {"_id": 0, "password_hash": 1})
+            if user and password_hasher.check(password, user["password_hash"]):
+                if password_hasher.needs_rehash(user["password_hash"]):
+                    # Upgrade hashes made at an old cost factor without delaying the login
+                    password_hasher.rehash_later(password, lambda new_hash: user_collection.update_one(
+                        {"username": username, "password_hash": user["password_hash"]},
+                        {"$set": {"password_hash": new_hash}}
+                    ))
                 session["username"] = username
                 session.permanent = True  
                 return redirect(url_for("main.home_page"))
             else:
                 error = "Invalid username or password"
+        except PasswordHasherBusy:
+            error = "The server is busy. Please try again in a moment."
+            return render_template("login_page.html", error=error), 503, {"Retry-After": str(BCRYPT_RETRY_AFTER)}
         except Exception as e:
             logger.error(f"Login error: {e}")
             error = "An error occurred. Please try again."
@@ -80,16 +154,20 @@ def signup_page():
                 error = "Username already exists"
                 return render_template("signup_page.html", error=error)
 
-            hashed_password = bcrypt.hashpw(user_password.encode('utf-8'), bcrypt.gensalt())
+            hashed_password = password_hasher.hash(user_password.encode('utf-8'))
 
             user_collection.insert_one({
                 "username": username,
                 "password_hash": hashed_password,
                 "watched": [],
                 "watch_list": [],
-                "notifications": []
+                "counts": {"watch_list": 0, "watched": 0},
+                "unread_notifications": 0
             })
             return redirect(url_for("main.login_page"))
+        except PasswordHasherBusy:
+            error = "The server is busy. Please try again in a moment."
+            return render_template("signup_page.html", error=error), 503, {"Retry-After": str(BCRYPT_RETRY_AFTER)}
         except Exception as e:
             logger.error(f"Signup error: {e}")
             error = "An error occurred. Please try again."
@@ -106,25 +184,23 @@ def home_page():
     
     username = username.lower()
     query_results = []
+    user_query = ""
+    recommended = False
+    page = total_pages = 1
 
     try:
-        # Fetch user's watched and watchlist
-        user_doc = user_collection.find_one(
-            {"username": username},
-            {"_id": 0, "watched": 1, "watch_list": 1, "notifications": 1}
-        )
-        watched_count = len(user_doc.get('watched', [])) if user_doc else 0
-        watchlist_count = len(user_doc.get('watch_list', [])) if user_doc else 0
-        notifications_count = len(user_doc.get('notifications', [])) if user_doc else 0
+        # Badge counts come from counters on the user document, never the lists themselves
+        counts = get_user_counts(username)
+        watched_count = counts["watched"]
+        watchlist_count = counts["watch_list"]
+        notifications_count = counts["unread_notifications"]
 
         # If it's a POST request (user searched)
         if request.method == 'POST':
             user_query = request.form.get("query", "").strip().lower()
             if not user_query:
                 # If empty search, just show default movies again
-                query_results = list(movie_collection.aggregate([{"$sample": {"size": 10}}]))
-                for movie in query_results:
-                    movie.pop('_id', None)
+                query_results = featured_pool.sample(10)
                 return render_template(
                     "homepage.html",
                     username=username.upper(),
@@ -134,34 +210,14 @@ def home_page():
                     notifications_count=notifications_count
                 )
 
-            # Check if movies for that query already exist in DB
-            existing_movies = list(movie_collection.find({"user_query": user_query}))
-            if existing_movies:
-                for movie in existing_movies:
-                    movie.pop('_id', None)
-                query_results = existing_movies
-            else:
-                # Fetch new movies from API
-                user_query_results = search_movie_by_api_key(user_query, TMDB_API_KEY)
-                for movie in user_query_results:
-                    query_results.append({
-                        "user_query": user_query,
-                        "id": movie.get("id"),
-                        "title": movie.get("title"),
-                        "release_date": movie.get("release_date"),
-                        "overview": movie.get("overview"),
-                        "vote_average": movie.get("vote_average"),
-                        "vote_count": movie.get("vote_count"),
-                        "poster_url": IMAGE_BASE + "w342" + movie.get("poster_path") if movie.get("poster_path") else None,
-                        "reviews": [],
-                    })
-                if query_results:
-                    movie_collection.insert_many(query_results)
+            try:
+                page = max(int(request.form.get("page", 1)), 1)
+            except ValueError:
+                page = 1
+            query_results, total_pages = search_movies_cached(user_query, page)
         else:
-            # If it's a GET request (user just logged in), show random movies
-            query_results = list(movie_collection.aggregate([{"$sample": {"size": 20}}]))
-            for movie in query_results:
-                movie.pop('_id', None)
+            # If it's a GET request (user just logged in), show what people with similar lists watched
+            query_results, recommended = recommended_movies(username, 20)
 
     except Exception as e:
         logger.error(f"Homepage error: {e}")
@@ -171,12 +227,65 @@ def home_page():
         "homepage.html",
         username=username.upper(),
         movies=query_results,
+        query=user_query,
+        page=page,
+        total_pages=total_pages,
+        recommended=recommended,
         watchlist_count=watchlist_count,
         watched_count=watched_count,
         notifications_count=notifications_count
     )
 
 
+@main_routes.route('/api/me/summary', methods=['GET'])
+def my_summary():
+    """Badge counts and the first page of every list, in one response"""
+    username = session.get("username", "")
+    if not username:
+        return jsonify({"error": "Not logged in"}), 401
+
+    try:
+        _, limit = parse_pagination(request.args)
+        body, headers = user_summary(username.lower(), limit, request.headers.get("If-None-Match"))
+        if headers is None:
+            return jsonify({"error": "User not found"}), 404
+        if body is None:
+            return "", 304, headers
+        return jsonify(body), headers
+    except Exception as e:
+        logger.error(f"Summary error: {e}")
+        return jsonify({"error": "Failed to fetch summary"}), 500
+
+
+@main_routes.route('/api/me/recommendations', methods=['GET'])
+def my_recommendations():
+    """Movies people with similar lists watched, from the precomputed neighbour index"""
+    username = session.get("username", "")
+    if not username:
+        return jsonify({"error": "Not logged in"}), 401
+
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 50)
+    except ValueError:
+        limit = 20
+    movies, recommended = recommended_movies(username.lower(), limit)
+    return jsonify({"movies": movies, "source": "neighbors" if recommended else "featured"})
+
+
+@main_routes.route('/search/suggest', methods=['GET'])
+def search_suggest():
+    """Typeahead: movies whose title has a word starting with `q`, answered from memory"""
+    if not session.get("username"):
+        return jsonify({"error": "Not logged in"}), 401
+
+    query = request.args.get("q", "")
+    try:
+        limit = min(max(int(request.args.get("limit", 8)), 1), 20)
+    except ValueError:
+        limit = 8
+    return jsonify({"query": query, "suggestions": typeahead_index.suggest(query, limit)})
+
+
 @main_routes.route('/get_watchlist', methods=['GET'])
 def get_watchlist():
     """API endpoint to get user's watchlist"""
@@ -187,21 +296,10 @@ def get_watchlist():
     username = username.lower()
     
     try:
-        user_doc = user_collection.find_one(
-            {"username": username},
-            {"_id": 0, "watch_list": 1}
-        )
-        
-        watchlist_ids = user_doc.get('watch_list', []) if user_doc else []
-        
-        # Fetch movie details for each movie in watchlist
-        movies = []
-        for movie_id in watchlist_ids:
-            movie_details = get_movie_details_from_tmdb(movie_id)
-            if movie_details:
-                movies.append(movie_details)
-        
-        return jsonify({"movies": movies})
+        body, headers = paginated_movies_response(username, "watch_list", request.args, request.headers.get("If-None-Match"))
+        if body is None:
+            return "", 304, headers
+        return jsonify(body), headers
     except Exception as e:
         logger.error(f"Get watchlist error: {e}")
         return jsonify({"error": "Failed to fetch watchlist"}), 500
@@ -217,19 +315,20 @@ def get_notifications():
     username = username.lower()
     
     try:
-        user_doc = user_collection.find_one(
-            {"username": username},
-            {"_id": 0, "notifications": 1}
-        )
-        
-        notifications = user_doc.get("notifications", []) if user_doc else []
-        return jsonify({"notifications": notifications})
+        _, limit = parse_pagination(request.args, default_limit=NOTIFICATION_PAGE_SIZE)
+        cursor = request.args.get("cursor")
+        # Day bucket: the retention TTL removes old notifications without a version bump
+        etag = make_etag("notifications", username, notifications_version(username), cursor, limit, int(time.time() // 86400))
+        headers = cache_headers(etag, PRIVATE_REVALIDATE)
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return "", 304, headers
+        return jsonify(list_notifications(username, cursor, limit)), headers
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
     except Exception as e:
         logger.error(f"Get notifications error: {e}")
         return jsonify({"error": "Failed to fetch notifications"}), 500
-    
 
-# Add this new route to app/routes.py
 
 @main_routes.route('/mark_notification_seen', methods=['POST'])
 def mark_notification_seen():
@@ -239,34 +338,13 @@ def mark_notification_seen():
     
     try:
         data = request.get_json()
-        notification_index = data.get('notificationIndex')
+        notification_id = data.get('notificationId')
         
-        if notification_index is None:
-            return jsonify({"error": "Notification index required"}), 400
+        if not notification_id:
+            return jsonify({"error": "Notification id required"}), 400
 
-        # Get user's notifications
-        user_doc = user_collection.find_one(
-            {"username": username.lower()},
-            {"notifications": 1}
-        )
-        
-        if not user_doc or 'notifications' not in user_doc:
-            return jsonify({"error": "No notifications found"}), 404
-        
-        notifications = user_doc['notifications']
-        
-        # Check if index is valid
-        if notification_index < 0 or notification_index >= len(notifications):
-            return jsonify({"error": "Invalid notification index"}), 400
-        
-        # Remove the notification at the specified index
-        notifications.pop(notification_index)
-        
-        # Update the user document with the new notifications array
-        user_collection.update_one(
-            {"username": username.lower()},
-            {"$set": {"notifications": notifications}}
-        )
+        if not acknowledge_notification(username.lower(), notification_id):
+            return jsonify({"error": "Notification not found"}), 404
         
         return jsonify({"message": "Notification marked as seen"})
     except Exception as e:
@@ -284,21 +362,10 @@ def get_watched():
     username = username.lower()
     
     try:
-        user_doc = user_collection.find_one(
-            {"username": username},
-            {"_id": 0, "watched": 1}
-        )
-        
-        watched_ids = user_doc.get('watched', []) if user_doc else []
-        
-        # Fetch movie details for each watched movie
-        movies = []
-        for movie_id in watched_ids:
-            movie_details = get_movie_details_from_tmdb(movie_id)
-            if movie_details:
-                movies.append(movie_details)
-        
-        return jsonify({"movies": movies})
+        body, headers = paginated_movies_response(username, "watched", request.args, request.headers.get("If-None-Match"))
+        if body is None:
+            return "", 304, headers
+        return jsonify(body), headers
     except Exception as e:
         logger.error(f"Get watched error: {e}")
         return jsonify({"error": "Failed to fetch watched movies"}), 500
@@ -308,29 +375,21 @@ def get_watched():
 def get_movie_details(movie_id):
     """API endpoint to get detailed movie info"""
     try:
-        url = f"https://api.themoviedb.org/3/movie/{movie_id}?api_key={TMDB_API_KEY}&language=en-US"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        movie_data = response.json()
-        db_movie = movie_collection.find_one({"id": movie_id}, {"_id": 0, "reviews": 1})
-        reviews = db_movie.get("reviews", []) if db_movie else []
-
-        movie_details = {
-            "id": movie_data.get("id"),
-            "title": movie_data.get("title"),
-            "tagline": movie_data.get("tagline"),
-            "overview": movie_data.get("overview"),
-            "release_date": movie_data.get("release_date"),
-            "runtime": movie_data.get("runtime"),
-            "vote_average": round(movie_data.get("vote_average", 0), 1),
-            "vote_count": movie_data.get("vote_count"),
-            "genres": ", ".join([genre["name"] for genre in movie_data.get("genres", [])]),
-            "poster_url": IMAGE_BASE + "w500" + movie_data.get("poster_path") if movie_data.get("poster_path") else None,
-            "backdrop_url": IMAGE_BASE + "w1280" + movie_data.get("backdrop_path") if movie_data.get("backdrop_path") else None,
-            "reviews": reviews
-        }
-        return jsonify(movie_details)
+        # One small read decides whether the client's copy is still current
+        movie = movie_collection.find_one({"id": movie_id}, MOVIE_VERSION_PROJECTION)
+        etag = movie_etag(movie_id, movie)
+        headers = cache_headers(etag, PUBLIC_REVALIDATE)
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            return "", 304, headers
+
+        movie_data = fetch_movie_from_tmdb(movie_id)
+        review_count, reviews, next_cursor = review_summary(movie)
+
+        movie_details = TMDBClient.map_movie_details(movie_data)
+        movie_details["review_count"] = review_count
+        movie_details["reviews"] = reviews
+        movie_details["next_reviews_cursor"] = next_cursor
+        return jsonify(movie_details), headers
     except requests.RequestException as e:
         logger.error(f"Error fetching movie details: {e}")
         return jsonify({"error": "Movie not found"}), 404
@@ -338,6 +397,18 @@ def get_movie_details(movie_id):
         logger.error(f"Unexpected error: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@main_routes.route('/movie/<int:movie_id>/reviews', methods=['GET'])
+def get_movie_reviews(movie_id):
+    """API endpoint to page through a movie's reviews"""
+    try:
+        _, limit = parse_pagination(request.args, default_limit=REVIEW_PAGE_SIZE)
+        return jsonify(list_reviews(movie_id, request.args.get("cursor"), limit))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    except Exception as e:
+        logger.error(f"Get reviews error: {e}")
+        return jsonify({"error": "Failed to fetch reviews"}), 500
+
 @main_routes.route('/add_to_watchlist', methods=['POST'])
 def add_to_watchlist():
     username = session.get("username", "")
@@ -351,12 +422,7 @@ def add_to_watchlist():
         if not movie_id:
             return jsonify({"error": "Movie ID required"}), 400
 
-        result = user_collection.update_one(
-            {"username": username.lower()},
-            {"$addToSet": {"watch_list": movie_id}}
-        )
-
-        if result.modified_count > 0:
+        if add_to_user_list(username.lower(), "watch_list", movie_id):
             message = "Movie added to your watchlist!"
         else:
             message = "Movie is already in your watchlist."
@@ -378,19 +444,14 @@ def add_to_watched():
         if not movie_id:
             return jsonify({"error": "Movie ID required"}), 400
 
-        # Add to watched list
-        result = user_collection.update_one(
-            {"username": username.lower()},
-            {"$addToSet": {"watched": movie_id}}
+        # Add to watched and drop from the watch list in one write
+        before = apply_list_changes(
+            username.lower(), add={"watched": [movie_id]},
+            projection={"_id": 0, "was_watched": {"$in": [{"$literal": movie_id}, {"$ifNull": ["$watched", []]}]}},
+            return_document=ReturnDocument.BEFORE
         )
 
-        # Remove from watch list (if it exists there)
-        user_collection.update_one(
-            {"username": username.lower()},
-            {"$pull": {"watch_list": movie_id}}
-        )
-
-        if result.modified_count > 0:
+        if before is not None and not before["was_watched"]:
             message = "Movie marked as watched and removed from watch later!"
         else:
             message = "Movie is already in your watched list."
@@ -400,6 +461,59 @@ def add_to_watched():
         return jsonify({"error": "Failed to add to watched"}), 500
     
 
+@main_routes.route('/api/me/lists', methods=['POST'])
+def update_my_lists():
+    """Add/remove many movies across both lists in one atomic write"""
+    username = session.get("username", "")
+    if not username:
+        return jsonify({"error": "Not logged in"}), 401
+
+    try:
+        add, remove = parse_list_changes(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        user = apply_list_changes(username.lower(), add=add, remove=remove)
+        if user is None:
+            return jsonify({"error": "User not found"}), 404
+        return jsonify({"counts": user.get("counts", {})})
+    except Exception as e:
+        logger.error(f"Batch list update error: {e}")
+        return jsonify({"error": "Failed to update lists"}), 500
+
+
+@main_routes.route('/api/me/import', methods=['POST'])
+def import_my_list():
+    """
+    Import a CSV or JSON export into a list. The upload is read and applied
+    in batches as it arrives; progress is streamed back as JSON lines.
+    """
+    username = session.get("username", "")
+    if not username:
+        return jsonify({"error": "Not logged in"}), 401
+
+    upload = request.files.get("file")
+    field = request.form.get("list", "watch_list")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "An export file is required"}), 400
+    if field not in LIST_FIELDS:
+        return jsonify({"error": f"list must be one of {', '.join(LIST_FIELDS)}"}), 400
+
+    def progress():
+        try:
+            rows = iter_import_rows(upload.stream, upload.filename)
+            for update in import_user_list(username.lower(), field, rows, normalize_query):
+                yield json.dumps(update) + "\n"
+        except (UnicodeDecodeError, ValueError, csv.Error) as e:
+            yield json.dumps({"error": f"Could not read the file: {e}", "done": True}) + "\n"
+        except Exception as e:
+            logger.error(f"List import error: {e}")
+            yield json.dumps({"error": "Import failed", "done": True}) + "\n"
+
+    return Response(stream_with_context(progress()), mimetype="application/x-ndjson")
+
+
 @main_routes.route('/submit_reviews', methods=['POST'])
 def submit_reviews():
     username = session.get("username", "")
@@ -410,22 +524,11 @@ def submit_reviews():
         data = request.get_json()
         movieId = data.get('movieId')
         reviewText = data.get('reviewText', '').strip()
-        reviewdate = data.get('date')
 
         if not movieId or not reviewText:
             return jsonify({"error": "Movie ID and review text required"}), 400
 
-        review = {
-            "username": username,
-            "reviewText": reviewText,
-            "date": reviewdate
-        }
-
-        movie_collection.update_one(
-            {"id": movieId},
-            {"$push": {"reviews": review}},
-            upsert=True
-        )
+        add_review(movieId, username, reviewText)
         add_notification(movieId, reviewText, username)
         
         return jsonify({"message": "Review submitted successfully!"})
@@ -43,39 +43,112 @@ function displayMovieDetails(movie) {
             </div>
 
             <div class="reviews-section">
-                <h3>User Reviews</h3>
+                <h3>User Reviews (${movie.review_count || 0})</h3>
                 <div class="add-review-form">
                     <textarea id="reviewText" placeholder="Write your review..." rows="3"></textarea>
                     <button class="btn-submit-review" onclick="submitReview(${movie.id})">Submit Review</button>
                 </div>
                 <div id="reviewsList" class="reviews-list">
                     ${movie.reviews && movie.reviews.length > 0
-                        ? movie.reviews.map(r => `
-                            <div class="review-item">
-                                <div class="review-header">
-                                    <strong>${r.username}</strong>
-                                    <span class="review-date">${r.date}</span>
-                                </div>
-                                <p class="review-text">${r.reviewText}</p>
-                            </div>
-                        `).join('')
+                        ? renderReviews(movie.reviews)
                         : '<p class="no-reviews">No reviews yet. Be the first!</p>'
                     }
                 </div>
+                ${movie.next_reviews_cursor
+                    ? `<button id="loadMoreReviews" class="btn-load-more" onclick="loadMoreReviews(${movie.id}, '${movie.next_reviews_cursor}')">Load more reviews</button>`
+                    : ''}
             </div>
         </div>
     `;
 }
 
+function renderReviews(reviews) {
+    return reviews.map(r => `
+        <div class="review-item">
+            <div class="review-header">
+                <strong>${r.username}</strong>
+                <span class="review-date">${r.date}</span>
+            </div>
+            <p class="review-text">${r.reviewText}</p>
+        </div>
+    `).join('');
+}
+
+// Fetch the next page of reviews and append it to the modal
+function loadMoreReviews(movieId, cursor) {
+    fetch(`/movie/${movieId}/reviews?cursor=${encodeURIComponent(cursor)}`)
+        .then(response => response.json())
+        .then(data => {
+            document.getElementById('reviewsList').insertAdjacentHTML('beforeend', renderReviews(data.reviews || []));
+            const button = document.getElementById('loadMoreReviews');
+            if (data.next_cursor) {
+                button.setAttribute('onclick', `loadMoreReviews(${movieId}, '${data.next_cursor}')`);
+            } else {
+                button.remove();
+            }
+        })
+        .catch(err => console.error(err));
+}
+
+// Lists are fetched one page at a time; "Load more" pulls the next page
+const LIST_PAGE_SIZE = 24;
+const watchlistState = { movies: [], nextOffset: 0 };
+const watchedState = { movies: [], nextOffset: 0 };
+
+// Counts plus the first page of every list in one request; revalidated via
+// ETag, so reopening a modal with nothing changed costs only a 304
+function fetchSummary() {
+    return fetch(`/api/me/summary?limit=${LIST_PAGE_SIZE}`)
+        .then(response => response.json())
+        .then(data => {
+            updateCounts(data.counts || {});
+            return data;
+        });
+}
+
+function updateCounts(counts) {
+    const badges = { watchlistCount: counts.watch_list, watchedCount: counts.watched, notificationsCount: counts.unread_notifications };
+    Object.entries(badges).forEach(([id, value]) => {
+        const badge = document.getElementById(id);
+        if (badge && value !== undefined) badge.textContent = value;
+    });
+}
+
+function fetchListPage(endpoint, state) {
+    return fetch(`${endpoint}?offset=${state.nextOffset}&limit=${LIST_PAGE_SIZE}`)
+        .then(response => response.json())
+        .then(data => {
+            state.movies = state.movies.concat(data.movies || []);
+            state.nextOffset = data.next_offset;
+            return state;
+        });
+}
+
+function loadMoreButton(state, onclick) {
+    return state.nextOffset !== null && state.nextOffset !== undefined
+        ? `<button class="btn-load-more" onclick="${onclick}()">Load more</button>`
+        : '';
+}
+
 // Function to open watchlist modal
 function openWatchlistModal() {
     watchlistModal.style.display = 'block';
     document.getElementById('watchlistBody').innerHTML = '<div class="loading">Loading...</div>';
-
-    fetch('/get_watchlist')
-        .then(response => response.json())
+    fetchSummary()
         .then(data => {
-            displayWatchlistModal(data.movies);
+            watchlistState.movies = data.watch_list.movies || [];
+            watchlistState.nextOffset = data.watch_list.next_offset;
+            displayWatchlistModal(watchlistState.movies);
+        })
+        .catch(error => {
+            document.getElementById('watchlistBody').innerHTML = '<p>Error loading watchlist.</p>';
+        });
+}
+
+function loadMoreWatchlist() {
+    fetchListPage('/get_watchlist', watchlistState)
+        .then(state => {
+            displayWatchlistModal(state.movies);
         })
         .catch(error => {
             document.getElementById('watchlistBody').innerHTML = '<p>Error loading watchlist.</p>';
@@ -109,6 +182,7 @@ function displayWatchlistModal(movies) {
                         </div>
                     `).join('')}
                 </div>
+                ${loadMoreButton(watchlistState, 'loadMoreWatchlist')}
             </div>
         `;
     } else {
@@ -125,31 +199,61 @@ function displayWatchlistModal(movies) {
 function openWatchedModal() {
     watchedModal.style.display = 'block';
     document.getElementById('watchedBody').innerHTML = '<div class="loading">Loading...</div>';
-
-    fetch('/get_watched')
-        .then(response => response.json())
+    fetchSummary()
         .then(data => {
-            displayListModal(data.movies, 'watchedBody', 'Watched Movies', 'You haven\'t marked any movies as watched yet.');
+            watchedState.movies = data.watched.movies || [];
+            watchedState.nextOffset = data.watched.next_offset;
+            showWatched();
         })
         .catch(error => {
             document.getElementById('watchedBody').innerHTML = '<p>Error loading watched movies.</p>';
         });
 }
 
+function showWatched() {
+    displayListModal(watchedState.movies, 'watchedBody', 'Watched Movies', 'You haven\'t marked any movies as watched yet.', loadMoreButton(watchedState, 'loadMoreWatched'));
+}
+
+function loadMoreWatched() {
+    fetchListPage('/get_watched', watchedState)
+        .then(showWatched)
+        .catch(error => {
+            document.getElementById('watchedBody').innerHTML = '<p>Error loading watched movies.</p>';
+        });
+}
+
 
 // Function to open notifications modal
+const notificationsState = { notifications: [], nextCursor: null };
+
 function openNotificationsModal() {
     notificationsModal.style.display = 'block';
     const notificationsBody = document.getElementById('notificationsBody');
     notificationsBody.innerHTML = '<div class="loading">Loading...</div>';
+    fetchSummary()
+        .then(data => {
+            notificationsState.notifications = data.notifications.notifications || [];
+            notificationsState.nextCursor = data.notifications.next_cursor;
+            displayNotifications(notificationsState.notifications);
+        })
+        .catch(error => {
+            notificationsBody.innerHTML = '<p>Error loading notifications.</p>';
+            console.error(error);
+        });
+}
+
+function loadMoreNotifications() {
+    const cursor = notificationsState.nextCursor ? `?cursor=${encodeURIComponent(notificationsState.nextCursor)}` : '';
 
-    fetch('/get_notifications')
+    fetch(`/get_notifications${cursor}`)
         .then(response => response.json())
         .then(data => {
-            displayNotifications(data.notifications);
+            notificationsState.notifications = notificationsState.notifications.concat(data.notifications || []);
+            notificationsState.nextCursor = data.next_cursor;
+            displayNotifications(notificationsState.notifications);
         })
         .catch(error => {
-            notificationsBody.innerHTML = '<p>Error loading notifications.</p>';
+            document.getElementById('notificationsBody').innerHTML = '<p>Error loading notifications.</p>';
             console.error(error);
         });
 }
@@ -162,7 +266,7 @@ function displayNotifications(notifications) {
             <div class="list-modal-content">
                 <h2>Notifications</h2>
                 <ul class="notifications-list">
-                    ${notifications.map((n, index) => `
+                    ${notifications.map(n => `
                         <li class="notification-item">
                             <div class="notification-content">
                                 <p class="notification-text">
@@ -172,7 +276,7 @@ function displayNotifications(notifications) {
                                 <p class="notification-review">"${n.text}"</p>
                                 <div class="notification-footer">
                                     <span class="notification-date">${formatDate(n.date)}</span>
-                                    <button class="btn-mark-seen" onclick="markNotificationSeen(${index})">
+                                    <button class="btn-mark-seen" onclick="markNotificationSeen('${n.id}')">
                                         Mark as Seen
                                     </button>
                                 </div>
@@ -180,6 +284,9 @@ function displayNotifications(notifications) {
                         </li>
                     `).join('')}
                 </ul>
+                ${notificationsState.nextCursor
+                    ? '<button class="btn-load-more" onclick="loadMoreNotifications()">Load more</button>'
+                    : ''}
             </div>
         `;
     } else {
@@ -192,19 +299,17 @@ function displayNotifications(notifications) {
     }
 }
 
-function markNotificationSeen(notificationIndex) {
+function markNotificationSeen(notificationId) {
     fetch('/mark_notification_seen', {
         method: 'POST',
         headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({ notificationIndex })
+        body: JSON.stringify({ notificationId })
     })
     .then(res => res.json())
     .then(data => {
         showMessage(data.message || 'Notification removed');
-        // Refresh notifications
+        // Refresh notifications and the badge
         openNotificationsModal();
-        // Update notification count
-        setTimeout(() => location.reload(), 1000);
     })
     .catch(err => {
         console.error('Error marking notification as seen:', err);
@@ -243,7 +348,7 @@ window.onclick = e => {
 
 
 // Function to display list in modal
-function displayListModal(movies, bodyId, title, emptyMessage) {
+function displayListModal(movies, bodyId, title, emptyMessage, footer = '') {
     const body = document.getElementById(bodyId);
     
     if (movies && movies.length > 0) {
@@ -264,6 +369,7 @@ function displayListModal(movies, bodyId, title, emptyMessage) {
                         </div>
                     `).join('')}
                 </div>
+                ${footer}
             </div>
         `;
     } else {
@@ -306,8 +412,7 @@ function addToWatchlist(movieId) {
     .then(res => res.json())
     .then(data => {
         showMessage(data.message);
-        // Refresh page to update count
-        setTimeout(() => location.reload(), 1500);
+        fetchSummary().catch(err => console.error(err));
     })
     .catch(err => console.error(err));
 }
@@ -322,8 +427,12 @@ function addToWatched(movieId) {
     .then(res => res.json())
     .then(data => {
         showMessage(data.message);
-        // Refresh page to update count
-        setTimeout(() => location.reload(), 1500);
+        // Update counts, and the watch later list if it is open
+        if (watchlistModal.style.display === 'block') {
+            openWatchlistModal();
+        } else {
+            fetchSummary().catch(err => console.error(err));
+        }
     })
     .catch(err => console.error(err));
 }
@@ -333,12 +442,10 @@ function submitReview(movieId) {
     const reviewText = document.getElementById('reviewText').value.trim();
     if(!reviewText) return alert('Write a review first!');
 
-    const currentDate = new Date().toISOString().split('T')[0];
-
     fetch('/submit_reviews', {
         method: 'POST',
         headers: {'Content-Type':'application/json'},
-        body: JSON.stringify({ reviewText, username, date: currentDate, movieId })
+        body: JSON.stringify({ reviewText, username, movieId })
     })
     .then(res => res.json())
     .then(data => {
@@ -355,4 +462,34 @@ function showMessage(msg) {
     msgDiv.textContent = msg;
     msgDiv.style.display = 'block';
     setTimeout(() => msgDiv.style.display = 'none', 3000);
-}
\ No newline at end of file
+}
+
+// Search typeahead: suggest titles as the user types
+const searchInput = document.getElementById('searchInput');
+const searchSuggestions = document.getElementById('searchSuggestions');
+let suggestTimer = null;
+
+if (searchInput) {
+    searchInput.addEventListener('input', () => {
+        clearTimeout(suggestTimer);
+        const query = searchInput.value.trim();
+        if (query.length < 2) {
+            searchSuggestions.innerHTML = '';
+            return;
+        }
+        suggestTimer = setTimeout(() => {
+            fetch(`/search/suggest?q=${encodeURIComponent(query)}`)
+                .then(res => res.json())
+                .then(data => {
+                    searchSuggestions.innerHTML = '';
+                    (data.suggestions || []).forEach(movie => {
+                        const option = document.createElement('option');
+                        option.value = movie.title;
+                        if (movie.year) option.label = `${movie.title} (${movie.year})`;
+                        searchSuggestions.appendChild(option);
+                    });
+                })
+                .catch(err => console.error(err));
+        }, 150);
+    });
+}
@@ -1,46 +1,182 @@
 import os
+import time
+import random
 import logging
-from pymongo import MongoClient
-from pymongo.errors import ServerSelectionTimeoutError, ConfigurationError, ConnectionFailure
+import requests
+from requests.adapters import HTTPAdapter
+from .outbound import TokenBucket, SingleFlight, RateLimitExceeded
+from .metrics import observe_tmdb
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 TMDB_API_KEY = os.environ.get("TMDB_API_KEY")
-MONGO_URI = os.environ.get("MONGO_URI")
 
-if not TMDB_API_KEY or not MONGO_URI:
-    raise ValueError("TMDB_API_KEY and MONGO_URI environment variables are required")
+if not TMDB_API_KEY:
+    raise ValueError("TMDB_API_KEY environment variable is required")
 
+IMAGE_BASE = "https://image.tmdb.org/t/p/"
+# Images are served through our own cache (`/images/<size>/<file>`); set to IMAGE_BASE to link TMDB directly
+IMAGE_PROXY_BASE = os.environ.get("IMAGE_PROXY_BASE", "/images/")
 
 
-try:
-    client = MongoClient(
-        MONGO_URI,
-        serverSelectionTimeoutMS=30000,
-        connectTimeoutMS=30000,
-        socketTimeoutMS=30000,
-        tls=True,
-        tlsAllowInvalidCertificates=False,
-        retryWrites=True,
-        w="majority"
-    )
+class TMDBClient:
+    """
+    Thin TMDB API client.
 
-    db = client["movie_tracker_123"]
+    Each worker process gets its own pooled keep-alive session (built lazily
+    so gunicorn forks don't share sockets). 429/5xx responses and connection
+    errors are retried with jittered exponential backoff, honouring
+    Retry-After when TMDB sends it.
 
-    # Define collections
-    user_collection = db["users"]
-    movie_collection = db["movies"]
+    Outbound traffic is shaped by a process-wide token bucket, and identical
+    concurrent requests are coalesced into one call whose result every
+    waiter shares. Callers pick per call whether to queue for a token
+    (`block=True`) or fail fast with RateLimitExceeded.
+    """
 
-    # Test the connection immediately
-    client.admin.command("ping")
-    logger.info("✅ Successfully connected to MongoDB Atlas (Production Mode)")
+    # Overridable so benchmarks can point at benchmarks/fake_tmdb.py
+    BASE_URL = os.environ.get("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-except (ServerSelectionTimeoutError, ConnectionFailure, ConfigurationError) as e:
-    logger.error(f"❌ MongoDB connection failed: {e}")
-    raise SystemExit("Database connection failed. Application stopped.")
+    def __init__(self, api_key, pool_size=10, connect_timeout=3.05, read_timeout=10,
+                 max_retries=3, backoff_base=0.25, backoff_max=8.0,
+                 rate_limit=20, burst=None, block=True, queue_timeout=10):
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.block = block
+        self.queue_timeout = queue_timeout
+        self.bucket = TokenBucket(rate_limit, burst)
+        self.single_flight = SingleFlight()
+        self.requests_sent = 0
+        self._session = None
+        self._session_pid = None
 
-except Exception as e:
-    logger.error(f"❌ Unexpected MongoDB initialization error: {e}")
-    raise SystemExit("Database initialization failed. Application stopped.")
+    @property
+    def session(self):
+        if self._session is None or self._session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+            self._session_pid = os.getpid()
+        return self._session
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, path, params=None, api_key=None, block=None):
+        """GET `path` from the TMDB API and return the decoded JSON body"""
+        query = {"api_key": api_key or self.api_key, "language": "en-US"}
+        query.update(params or {})
+        block = self.block if block is None else block
+        key = (path, tuple(sorted(query.items())))
+        return self.single_flight.do(key, self._fetch, path, query, block)
+
+    def _fetch(self, path, query, block):
+        url = f"{self.BASE_URL}{path}"
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            if not self.bucket.acquire(block=block, timeout=self.queue_timeout):
+                raise RateLimitExceeded(f"TMDB outbound rate limit reached for {path}")
+            self.requests_sent += 1
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=query, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                observe_tmdb(path, time.perf_counter() - started, type(e).__name__)
+                if last_attempt:
+                    raise
+                logger.warning(f"TMDB request to {path} failed ({e}), retrying")
+                time.sleep(self._backoff(attempt))
+                continue
+
+            observe_tmdb(path, time.perf_counter() - started, None if response.ok else str(response.status_code))
+            if response.status_code in self.RETRY_STATUSES and not last_attempt:
+                logger.warning(f"TMDB returned {response.status_code} for {path}, retrying")
+                time.sleep(self._backoff(attempt, response))
+                continue
+
+            response.raise_for_status()
+            return response.json()
+
+    def search_movies(self, query, page=1, api_key=None, block=None):
+        return self.get("/search/movie", {"query": query, "page": page}, api_key=api_key, block=block)
+
+    def get_movie(self, movie_id, block=None):
+        return self.get(f"/movie/{movie_id}", block=block)
+
+    def trending_movies(self, window="week", page=1, block=None):
+        return self.get(f"/trending/movie/{window}", {"page": page}, block=block)
+
+    def popular_movies(self, page=1, block=None):
+        return self.get("/movie/popular", {"page": page}, block=block)
+
+    def stats(self):
+        return {
+            "requests": self.requests_sent,
+            "in_flight": self.single_flight.in_flight,
+            "coalesced": self.single_flight.coalesced,
+            "throttled": self.bucket.throttled,
+            "rejected": self.bucket.rejected,
+        }
+
+    @staticmethod
+    def image_url(path, size):
+        return IMAGE_PROXY_BASE + size + path if path else None
+
+    @staticmethod
+    def map_movie_summary(movie_data):
+        """Card-sized view of a TMDB movie (search result or detail payload)"""
+        return {
+            "id": movie_data.get("id"),
+            "title": movie_data.get("title"),
+            "release_date": movie_data.get("release_date"),
+            "overview": movie_data.get("overview"),
+            "vote_average": round(movie_data.get("vote_average") or 0, 1),
+            "vote_count": movie_data.get("vote_count"),
+            "poster_url": TMDBClient.image_url(movie_data.get("poster_path"), "w342"),
+        }
+
+    @staticmethod
+    def map_movie_details(movie_data):
+        """Full view of a TMDB movie detail payload, as shown in the movie modal"""
+        return {
+            "id": movie_data.get("id"),
+            "title": movie_data.get("title"),
+            "tagline": movie_data.get("tagline"),
+            "overview": movie_data.get("overview"),
+            "release_date": movie_data.get("release_date"),
+            "runtime": movie_data.get("runtime"),
+            "vote_average": round(movie_data.get("vote_average") or 0, 1),
+            "vote_count": movie_data.get("vote_count"),
+            "genres": ", ".join([genre["name"] for genre in movie_data.get("genres", [])]),
+            "poster_url": TMDBClient.image_url(movie_data.get("poster_path"), "w500"),
+            "backdrop_url": TMDBClient.image_url(movie_data.get("backdrop_path"), "w1280"),
+        }
+
+
+TMDB_CLIENT_SETTINGS = dict(
+    pool_size=int(os.environ.get("TMDB_POOL_SIZE", "10")),
+    connect_timeout=float(os.environ.get("TMDB_CONNECT_TIMEOUT", "3.05")),
+    read_timeout=float(os.environ.get("TMDB_READ_TIMEOUT", "10")),
+    max_retries=int(os.environ.get("TMDB_MAX_RETRIES", "3")),
+    rate_limit=float(os.environ.get("TMDB_RATE_LIMIT", "20")),
+    burst=float(os.environ.get("TMDB_RATE_BURST", "20")),
+    block=os.environ.get("TMDB_RATE_LIMIT_MODE", "queue") != "fail",
+)
+
+tmdb_client = TMDBClient(TMDB_API_KEY, **TMDB_CLIENT_SETTINGS)
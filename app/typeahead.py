@@ -0,0 +1,174 @@
+import os
+import time
+import heapq
+import bisect
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TypeaheadIndex:
+    """
+    Per-worker, in-memory prefix index over movie titles.
+
+    Every title (and original title) is indexed under each of its first
+    `max_words` word positions, so "mat" finds "The Matrix". Keys live in
+    one sorted list searched with bisect; prefixes of up to `short_prefix`
+    characters would match huge ranges, so their top `top_k` movies by
+    vote count are precomputed instead.
+
+    `loader(after_id, limit)` yields movie documents (with `_id`); the
+    first call builds the index from the `limit` most voted movies, later
+    calls pass the highest `_id` seen so only newly added movies are
+    merged in. A full rebuild every `rebuild_interval` picks up edits.
+    Updates are copy-on-write, so lookups never take a lock.
+    """
+
+    def __init__(self, loader, normalize, interval=60, rebuild_interval=86400,
+                 max_movies=100000, max_words=4, short_prefix=4, top_k=20, scan_limit=2000):
+        self.loader = loader
+        self.normalize = normalize
+        self.interval = interval
+        self.rebuild_interval = rebuild_interval
+        self.max_movies = max_movies
+        self.max_words = max_words
+        self.short_prefix = short_prefix
+        self.top_k = top_k
+        self.scan_limit = scan_limit
+        # (entries, movies, short): sorted (key, id) pairs, id -> suggestion, prefix -> [(votes, id)]
+        self._snapshot = ([], {}, {})
+        self._last_id = None
+        self._built_at = None
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _keys(self, title):
+        words = self.normalize(title).split()
+        return {" ".join(words[i:]) for i in range(min(len(words), self.max_words))}
+
+    def _suggestion(self, doc):
+        return {
+            "id": doc["id"],
+            "title": doc.get("title"),
+            "year": (doc.get("release_date") or "")[:4] or None,
+            "poster_url": doc.get("poster_url"),
+            "votes": doc.get("vote_count") or 0,
+        }
+
+    def _add_short(self, short, key, votes, movie_id):
+        for length in range(1, min(self.short_prefix, len(key)) + 1):
+            top = short.setdefault(key[:length], [])
+            if (votes, movie_id) in top:
+                continue
+            if len(top) < self.top_k:
+                heapq.heappush(top, (votes, movie_id))
+            elif votes > top[0][0]:
+                heapq.heapreplace(top, (votes, movie_id))
+
+    def _index(self, docs, entries, movies, short):
+        """Add `docs` to copies of the given structures; returns the new snapshot and highest _id"""
+        movies = dict(movies)
+        short = {prefix: list(top) for prefix, top in short.items()}
+        new_entries = []
+        last_id = None
+        for doc in docs:
+            last_id = doc["_id"] if last_id is None else max(last_id, doc["_id"])
+            if doc.get("id") is None or not doc.get("title"):
+                continue
+            suggestion = self._suggestion(doc)
+            known = movies.get(doc["id"])
+            movies[doc["id"]] = suggestion
+            if known and known["title"] == suggestion["title"]:
+                continue
+            keys = self._keys(doc["title"])
+            if doc.get("original_title"):
+                keys |= self._keys(doc["original_title"])
+            for key in keys:
+                new_entries.append((key, doc["id"]))
+                self._add_short(short, key, suggestion["votes"], doc["id"])
+        new_entries.sort()
+        if entries:
+            new_entries = list(heapq.merge(entries, new_entries))
+        return (new_entries, movies, short), last_id
+
+    def rebuild(self):
+        start = time.monotonic()
+        try:
+            snapshot, last_id = self._index(self.loader(None, self.max_movies), [], {}, {})
+        except Exception as e:
+            logger.error(f"Typeahead rebuild error: {e}")
+            return
+        with self._write_lock:
+            self._snapshot = snapshot
+            self._last_id = last_id
+            self._built_at = time.monotonic()
+        logger.info(f"Typeahead index built: {len(snapshot[1])} movies in {time.monotonic() - start:.1f}s")
+
+    def update(self):
+        """Merge in movies added since the last build or update"""
+        if self._last_id is None:
+            return self.rebuild()
+        with self._write_lock:
+            try:
+                docs = list(self.loader(self._last_id, None))
+                # Nothing new (the usual case): don't copy the index just to get the same one back
+                if not docs:
+                    return
+                snapshot, last_id = self._index(docs, *self._snapshot)
+            except Exception as e:
+                logger.error(f"Typeahead update error: {e}")
+                return
+            self._snapshot = snapshot
+            self._last_id = last_id
+
+    def _run(self):
+        # Built in the background: until the first build lands, suggest() returns nothing
+        self.rebuild()
+        while not self._stop.wait(self.interval):
+            if self._built_at is None or time.monotonic() - self._built_at >= self.rebuild_interval:
+                self.rebuild()
+            else:
+                self.update()
+
+    def start(self):
+        """Start the build/update thread for this process (no-op if already running)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._snapshot = ([], {}, {})
+            self._last_id = None
+            self._thread = threading.Thread(target=self._run, name="typeahead-index", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        self._stop.set()
+
+    def suggest(self, prefix, limit=8):
+        """Up to `limit` movies whose title has a word starting with `prefix`, most voted first"""
+        if self._pid != os.getpid():
+            self.start()
+        key = self.normalize(prefix)
+        if not key:
+            return []
+        entries, movies, short = self._snapshot
+
+        if len(key) <= self.short_prefix:
+            # A movie whose votes changed can appear twice; keep its best entry
+            ranked = dict.fromkeys(movie_id for _, movie_id in sorted(short.get(key, []), reverse=True))
+            return [movies[movie_id] for movie_id in list(ranked)[:limit]]
+
+        lo = bisect.bisect_left(entries, (key,))
+        hi = min(bisect.bisect_left(entries, (key + "\uffff",)), lo + self.scan_limit)
+        ids = {movie_id for _, movie_id in entries[lo:hi]}
+        ranked = heapq.nlargest(limit, ids, key=lambda movie_id: movies[movie_id]["votes"])
+        return [movies[movie_id] for movie_id in ranked]
+
+    def stats(self):
+        entries, movies, _ = self._snapshot
+        return {"movies": len(movies), "keys": len(entries)}
@@ -0,0 +1,162 @@
+import logging
+from pymongo import ReturnDocument
+from .database import *
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+LIST_FIELDS = ("watch_list", "watched")
+# Most ids one batch request may add or remove, over all lists
+LIST_BATCH_MAX_IDS = 1000
+
+
+def _size(field):
+    return {"$size": {"$ifNull": [f"${field}", []]}}
+
+
+def _bump_version(field):
+    return {"$add": [{"$ifNull": [f"$list_versions.{field}", 0]}, 1]}
+
+
+# Last stage of every list mutation: recount both lists in the same write,
+# so the stored counters can never drift from the arrays
+RECOUNT_LISTS = {"$set": {f"counts.{field}": _size(field) for field in LIST_FIELDS}}
+
+# Badge counts; documents not yet backfilled by `flask migrate-catalog`
+# are counted on the server, still without shipping the arrays
+USER_COUNTS_PROJECTION = {
+    "_id": 0,
+    "watch_list": {"$ifNull": ["$counts.watch_list", _size("watch_list")]},
+    "watched": {"$ifNull": ["$counts.watched", _size("watched")]},
+    "unread_notifications": {"$max": [{"$ifNull": ["$unread_notifications", 0]}, 0]}
+}
+
+
+def get_user_counts(username):
+    """{watch_list, watched, unread_notifications} for the navigation badges"""
+    counts = user_collection.find_one({"username": username}, USER_COUNTS_PROJECTION)
+    return counts or {"watch_list": 0, "watched": 0, "unread_notifications": 0}
+
+
+def add_to_user_list(username, field, movie_id):
+    """Append `movie_id` to one of the user's lists; returns False if it was already there"""
+    result = user_collection.update_one(
+        {"username": username, field: {"$ne": movie_id}},
+        [
+            {"$set": {
+                # $literal: the id comes from the client and must never be read as a field path
+                field: {"$concatArrays": [{"$ifNull": [f"${field}", []]}, [{"$literal": movie_id}]]},
+                f"list_versions.{field}": _bump_version(field),
+                "lists_updated_at": "$$NOW"
+            }},
+            RECOUNT_LISTS
+        ]
+    )
+    return result.modified_count > 0
+
+
+def _ids(ids):
+    return {"$literal": list(dict.fromkeys(ids or []))}
+
+
+def _without(array, ids):
+    return {"$filter": {"input": array, "cond": {"$not": [{"$in": ["$$this", ids]}]}}}
+
+
+def _appended(array, ids):
+    return {"$concatArrays": [array, _without(ids, array)]}
+
+
+def apply_list_changes(username, add=None, remove=None, projection=None, return_document=ReturnDocument.AFTER):
+    """
+    Apply many list changes in one atomic write.
+
+    `add` and `remove` map a list field to movie ids. Marking a movie
+    watched also drops it from the watch list, as add_to_watched always
+    has. Existing order is kept and new ids are appended; each list's
+    version only moves if the list really changed. Returns the user
+    document (per `projection`, default the counters) before or after the
+    update, or None if there is no such user.
+    """
+    add = {field: add.get(field) for field in LIST_FIELDS} if add else {}
+    remove = {field: remove.get(field) for field in LIST_FIELDS} if remove else {}
+    newly_watched = list(add.get("watched") or [])
+    remove_from_watch_list = list(remove.get("watch_list") or []) + newly_watched
+    add_to_watch_list = [movie_id for movie_id in add.get("watch_list") or [] if movie_id not in newly_watched]
+
+    changes = {
+        "watched": (newly_watched, remove.get("watched")),
+        "watch_list": (add_to_watch_list, remove_from_watch_list),
+    }
+    new_lists = {}
+    for field, (added, removed) in changes.items():
+        current = {"$ifNull": [f"${field}", []]}
+        if removed:
+            current = _without(current, _ids(removed))
+        if added:
+            current = _appended(current, _ids(added))
+        new_lists[f"_next_{field}"] = current
+
+    return user_collection.find_one_and_update(
+        {"username": username},
+        [
+            {"$set": new_lists},
+            {"$set": {
+                f"list_versions.{field}": {"$cond": [
+                    {"$eq": [f"$_next_{field}", {"$ifNull": [f"${field}", []]}]},
+                    {"$ifNull": [f"$list_versions.{field}", 0]},
+                    _bump_version(field)
+                ]}
+                for field in LIST_FIELDS
+            }},
+            # Read by `flask build-recommendations --incremental` to find users to re-count
+            {"$set": {"lists_updated_at": {"$cond": [
+                {"$and": [{"$eq": [f"$_next_{field}", {"$ifNull": [f"${field}", []]}]} for field in LIST_FIELDS]},
+                "$lists_updated_at",
+                "$$NOW"
+            ]}}},
+            {"$set": {field: f"$_next_{field}" for field in LIST_FIELDS}},
+            {"$unset": [f"_next_{field}" for field in LIST_FIELDS]},
+            RECOUNT_LISTS
+        ],
+        projection=projection or {"_id": 0, "counts": 1},
+        return_document=return_document
+    )
+
+
+def _movie_id(value):
+    """A client-supplied movie id as an int, or None if it isn't one"""
+    # bool is an int subclass and int() truncates 2.5, but neither is a movie id
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        return None
+    try:
+        movie_id = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    # Must also fit the BSON int64 it is stored as
+    return movie_id if 0 < movie_id < 2 ** 63 else None
+
+
+def parse_list_changes(data):
+    """
+    Validate a batch body {"watch_list": {"add": [...], "remove": [...]}, "watched": {...}}
+    into (add, remove) dicts of int ids; raises ValueError on malformed input.
+    """
+    if not isinstance(data, dict) or not data or set(data) - set(LIST_FIELDS):
+        raise ValueError(f"Body must map {' and/or '.join(LIST_FIELDS)} to {{add, remove}}")
+    add, remove, total = {}, {}, 0
+    for field, change in data.items():
+        if not isinstance(change, dict) or set(change) - {"add", "remove"}:
+            raise ValueError(f"{field} must be an object with 'add' and/or 'remove' lists")
+        for action, target in (("add", add), ("remove", remove)):
+            ids = change.get(action) or []
+            if not isinstance(ids, list):
+                raise ValueError(f"{field}.{action} must be a list of movie ids")
+            target[field] = [_movie_id(movie_id) for movie_id in ids]
+            if None in target[field]:
+                raise ValueError(f"{field}.{action} must contain only movie ids")
+            total += len(ids)
+    if total > LIST_BATCH_MAX_IDS:
+        raise ValueError(f"At most {LIST_BATCH_MAX_IDS} ids per request")
+    return add, remove
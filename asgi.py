@@ -0,0 +1,5 @@
+from app import create_app
+from app.async_app import create_async_app
+
+# Async serving mode: `hypercorn asgi:app` (main.py remains the sync entrypoint)
+app = create_async_app(create_app())
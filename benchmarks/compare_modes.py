@@ -0,0 +1,42 @@
+"""
+Compare the sync (gunicorn) and async (hypercorn) serving modes.
+
+Start both servers against the same database, log in once to get a session
+cookie, then run e.g.:
+
+    python benchmarks/compare_modes.py \
+        --sync-url http://localhost:5000 --async-url http://localhost:5001 \
+        --cookie "session=..." --path /get_watchlist --path /movie/603 \
+        --concurrency 200 --requests 2000
+"""
+import asyncio
+import argparse
+from loadgen import run_load, client
+
+
+async def measure(base_url, path, cookie, concurrency, total):
+    headers = {"Cookie": cookie} if cookie else {}
+    async with client(base_url, concurrency, headers=headers) as http:
+        return await run_load(lambda _: http.get(path), concurrency, total, ok_statuses=range(200, 300))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sync-url", required=True)
+    parser.add_argument("--async-url", required=True)
+    parser.add_argument("--path", action="append", required=True, help="Endpoint to hit; repeatable")
+    parser.add_argument("--cookie", default="", help="Session cookie for endpoints that need a login")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'path':<28} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for path in args.path:
+        for mode, url in (("sync", args.sync_url), ("async", args.async_url)):
+            result = await measure(url, path, args.cookie, args.concurrency, args.requests)
+            print(f"{mode:<6} {path:<28} {result['throughput_rps']:>8} {result['p50_ms']:>8} "
+                  f"{result['p95_ms']:>8} {result['p99_ms']:>8} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
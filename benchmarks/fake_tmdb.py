@@ -0,0 +1,121 @@
+"""
+Local stand-in for the TMDB API, for offline benchmarks.
+
+Serves /3/search/movie, /3/movie/{id}, /3/movie/popular and
+/3/trending/movie/{window} with deterministic synthetic data, with optional
+added latency and injected errors:
+
+    python benchmarks/fake_tmdb.py --port 8001 --latency-ms 120 --jitter-ms 40 --error-rate 0.02
+
+Point the app at it with TMDB_BASE_URL=http://localhost:8001/3.
+"""
+import re
+import json
+import time
+import random
+import argparse
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RESULTS_PER_PAGE = 20
+TOTAL_PAGES = 5
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Horror", "Romance", "Science Fiction", "Thriller"]
+
+
+def fake_movie(movie_id, title=None):
+    rng = random.Random(movie_id)
+    return {
+        "id": movie_id,
+        "title": title or f"Benchmark Movie {movie_id}",
+        "original_title": title or f"Benchmark Movie {movie_id}",
+        "tagline": f"Tagline for movie {movie_id}",
+        "overview": " ".join(rng.choice(["a", "story", "about", "hero", "city", "night", "war", "love"]) for _ in range(40)),
+        "release_date": f"{rng.randint(1950, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "runtime": rng.randint(80, 180),
+        "vote_average": round(rng.uniform(1, 10), 3),
+        "vote_count": rng.randint(0, 30000),
+        "popularity": round(rng.uniform(0, 500), 3),
+        "genres": [{"id": i, "name": name} for i, name in enumerate(rng.sample(GENRES, 2))],
+        "poster_path": f"/poster{movie_id}.jpg",
+        "backdrop_path": f"/backdrop{movie_id}.jpg",
+    }
+
+
+def movie_page(page, first_id, title=None):
+    start = first_id + (page - 1) * RESULTS_PER_PAGE
+    return {
+        "page": page,
+        "results": [fake_movie(movie_id, title and f"{title} {movie_id}") for movie_id in range(start, start + RESULTS_PER_PAGE)],
+        "total_pages": TOTAL_PAGES,
+        "total_results": TOTAL_PAGES * RESULTS_PER_PAGE,
+    }
+
+
+class FakeTMDBHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+
+    def log_message(self, format, *args):
+        if self.config.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        config = self.config
+        delay = max(0, config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)) / 1000
+        time.sleep(delay)
+
+        if random.random() < config.error_rate:
+            headers = {"Retry-After": "1"} if config.error_status == 429 else None
+            return self._send(config.error_status, {"status_message": "Injected error"}, headers)
+
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        page = int(params.get("page", ["1"])[0])
+
+        if url.path == "/3/search/movie":
+            query = params.get("query", [""])[0]
+            # Stable ids per query so repeated searches return the same movies
+            first_id = 100000 + (sum(map(ord, query)) % 1000) * 100
+            return self._send(200, movie_page(page, first_id, query.title()))
+        if url.path == "/3/movie/popular" or re.fullmatch(r"/3/trending/movie/\w+", url.path):
+            return self._send(200, movie_page(page, 1))
+        match = re.fullmatch(r"/3/movie/(\d+)", url.path)
+        if match:
+            movie_id = int(match.group(1))
+            if movie_id > config.max_movie_id:
+                return self._send(404, {"status_message": "The resource you requested could not be found."})
+            return self._send(200, fake_movie(movie_id))
+        return self._send(404, {"status_message": "Unknown endpoint"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=100, help="Added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=30, help="Uniform +/- jitter around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="Status code for injected failures")
+    parser.add_argument("--max-movie-id", type=int, default=10_000_000, help="Ids above this return 404")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    FakeTMDBHandler.config = args
+    server = ThreadingHTTPServer((args.host, args.port), FakeTMDBHandler)
+    server.daemon_threads = True
+    print(f"Fake TMDB listening on http://{args.host}:{args.port}/3")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
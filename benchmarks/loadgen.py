@@ -0,0 +1,57 @@
+"""Shared load-generation helpers for the benchmark scripts."""
+import time
+import asyncio
+import statistics
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, errors, elapsed):
+    total = len(latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def run_load(send, concurrency, total, ok_statuses=range(200, 400)):
+    """
+    Call `send(i)` (a coroutine returning an httpx.Response) `total` times
+    from `concurrency` concurrent virtual users and summarize the latencies.
+    """
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def user():
+        nonlocal errors
+        for i in remaining:
+            start = time.perf_counter()
+            try:
+                response = await send(i)
+                if response.status_code not in ok_statuses:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def client(base_url, concurrency, **kwargs):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120, **kwargs)
@@ -0,0 +1,189 @@
+"""
+Scripted load scenarios against a running instance of the app.
+
+Bring up the disposable stack (local mongod, fake TMDB, app) with
+
+    docker compose -f benchmarks/docker-compose.yml up --build -d
+
+then seed the database and run every scenario:
+
+    python benchmarks/run_scenarios.py --seed --output results.json
+
+Results (p50/p95/p99 latency and throughput per endpoint) are printed and
+written as JSON, tagged with the current commit. Pass --compare old.json to
+print the change against an earlier run.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime
+from loadgen import run_load, client
+
+PASSWORD = "benchmark-password"
+POPULAR_MOVIE_ID = 550
+SEARCH_QUERIES = ["matrix", "the matrix", "star wars", "alien", "heat", "up", "jaws", "inception"]
+
+
+# --------------------- Seeding --------------------- #
+def seed(mongo_uri, db_name, storm_users, watchlist_size, followers, bcrypt_rounds):
+    import bcrypt
+    from pymongo import MongoClient
+
+    db = MongoClient(mongo_uri)[db_name]
+    users = db["users"]
+    start = time.monotonic()
+    users.delete_many({"username": {"$regex": "^bench_"}})
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(bcrypt_rounds))
+
+    def user(username, watch_list=(), watched=()):
+        return {
+            "username": username,
+            "password_hash": password_hash,
+            "watch_list": list(watch_list),
+            "watched": list(watched),
+            "unread_notifications": 0
+        }
+
+    users.insert_many([user(f"bench_login_{i}") for i in range(storm_users)])
+    users.insert_one(user("bench_viewer", watch_list=range(1, watchlist_size + 1), watched=range(1, 101)))
+    users.insert_one(user("bench_reviewer"))
+    for offset in range(0, followers, 5000):
+        users.insert_many([
+            user(f"bench_follower_{i}", watch_list=[POPULAR_MOVIE_ID])
+            for i in range(offset, min(offset + 5000, followers))
+        ])
+    print(f"Seeded {storm_users + followers + 2} users in {time.monotonic() - start:.1f}s")
+
+
+# --------------------- Scenarios --------------------- #
+async def logged_in_client(base_url, concurrency, username):
+    http = client(base_url, concurrency)
+    response = await http.post("/", data={"username": username, "password": PASSWORD})
+    if response.status_code != 302:
+        await http.aclose()
+        raise SystemExit(f"Could not log in as {username} (status {response.status_code})")
+    return http
+
+
+async def login_storm(args):
+    async with client(args.base_url, args.concurrency) as http:
+        async def send(i):
+            # Fresh cookie jar per attempt so every request is a real login
+            http.cookies.clear()
+            return await http.post("/", data={"username": f"bench_login_{i % args.storm_users}", "password": PASSWORD})
+        return {"POST /": await run_load(send, args.concurrency, args.requests, ok_statuses={302})}
+
+
+async def homepage_browsing(args):
+    http = await logged_in_client(args.base_url, args.concurrency, "bench_viewer")
+    async with http:
+        return {
+            "GET /homepage": await run_load(
+                lambda i: http.get("/homepage"), args.concurrency, args.requests),
+            "POST /homepage": await run_load(
+                lambda i: http.post("/homepage", data={"query": SEARCH_QUERIES[i % len(SEARCH_QUERIES)]}),
+                args.concurrency, args.requests),
+            "GET /movie/<id>": await run_load(
+                lambda i: http.get(f"/movie/{1 + i % 200}"), args.concurrency, args.requests),
+        }
+
+
+async def watchlist_500(args):
+    http = await logged_in_client(args.base_url, args.concurrency, "bench_viewer")
+    page_size = 24
+    async with http:
+        async def send(i):
+            offset = (i * page_size) % args.watchlist_size
+            return await http.get(f"/get_watchlist?offset={offset}&limit={page_size}")
+        return {"GET /get_watchlist": await run_load(send, args.concurrency, args.requests)}
+
+
+async def review_popular_movie(args):
+    http = await logged_in_client(args.base_url, args.concurrency, "bench_reviewer")
+    async with http:
+        async def send(i):
+            return await http.post("/submit_reviews", json={"movieId": POPULAR_MOVIE_ID, "reviewText": f"Benchmark review {i}"})
+        # Each review fans out to every follower, so keep this one small
+        return {"POST /submit_reviews": await run_load(send, min(args.concurrency, 10), min(args.requests, 50))}
+
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "homepage_browsing": homepage_browsing,
+    "watchlist_500": watchlist_500,
+    "review_10k_followers": review_popular_movie,
+}
+
+
+# --------------------- Reporting --------------------- #
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print(f"\n{'endpoint':<44} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:<44} {result['throughput_rps']:>9} {result['p50_ms']:>9} "
+              f"{result['p95_ms']:>9} {result['p99_ms']:>9} {result['errors']:>7}")
+        old = (baseline or {}).get(name)
+        if old:
+            deltas = []
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+                if old[key]:
+                    deltas.append(f"{key} {100 * (result[key] - old[key]) / old[key]:+.1f}%")
+            print(f"{'  vs baseline':<44} {', '.join(deltas)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Run only these; repeatable")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint")
+    parser.add_argument("--seed", action="store_true", help="(Re)create the benchmark users first")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="movie_tracker_bench")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--storm-users", type=int, default=200)
+    parser.add_argument("--watchlist-size", type=int, default=500)
+    parser.add_argument("--followers", type=int, default=10000)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.mongo_uri, args.db_name, args.storm_users, args.watchlist_size, args.followers, args.bcrypt_rounds)
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        print(f"Running {name}...", file=sys.stderr)
+        for endpoint, result in (await SCENARIOS[name](args)).items():
+            results[f"{name} {endpoint}"] = result
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": current_commit(),
+                "timestamp": datetime.utcnow().isoformat(),
+                "base_url": args.base_url,
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "results": results
+            }, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
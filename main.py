@@ -1,6 +1,10 @@
 from app import create_app
 
-app = create_app()
+# Spawned helper processes (the bcrypt pool) re-import this script as
+# __mp_main__; they only need the hashing functions, so don't build the
+# app and start its background threads in them
+if __name__ != "__mp_main__":
+    app = create_app()
 
 if __name__ == "__main__":
     if not app.secret_key:
@@ -0,0 +1,25 @@
+import os
+import sys
+
+# app.database refuses to import without a URI; the client is created lazily, so nothing connects
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCursor:
+    """Enough of a pymongo cursor for code that pages with sort/limit"""
+
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    def sort(self, key, direction=1):
+        self.docs.sort(key=lambda doc: doc[key], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        if count:
+            self.docs = self.docs[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self.docs)
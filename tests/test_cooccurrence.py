@@ -0,0 +1,86 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from conftest import FakeCursor
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+from app import cooccurrence
+from app.cooccurrence import CooccurrenceModel
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        docs = self.docs
+        if "_id" in query:
+            docs = [doc for doc in docs if doc["_id"] > query["_id"]["$gt"]]
+        if "lists_updated_at" in query:
+            since = query["lists_updated_at"]["$gt"]
+            docs = [doc for doc in docs if doc.get("lists_updated_at", datetime.min) > since]
+        return FakeCursor(docs)
+
+
+@pytest.fixture
+def users(monkeypatch):
+    rng = random.Random(7)
+    docs = [
+        {"_id": i, "watched": rng.sample(range(1, 40), 6), "watch_list": rng.sample(range(1, 40), 3)}
+        for i in range(60)
+    ]
+    monkeypatch.setattr(cooccurrence, "user_collection", FakeUsers(docs))
+    return docs
+
+
+def _counts_by_movie(model):
+    """Nonzero counts keyed by (movie id, movie id), independent of column order"""
+    counts = model.counts.tocoo()
+    return {
+        (model.movie_ids[i], model.movie_ids[j]): round(float(value), 4)
+        for i, j, value in zip(counts.row, counts.col, counts.data) if value
+    }
+
+
+def _all_neighbors(model):
+    return dict(model.neighbors(np.arange(len(model.movie_ids)), min_count=1))
+
+
+def test_update_matches_full_build(users):
+    model = CooccurrenceModel()
+    model.build(batch_size=16)
+
+    changed_at = datetime.utcnow() + timedelta(minutes=10)
+    users[3].update(watched=[1, 2, 41], watch_list=[5], lists_updated_at=changed_at)
+    users.append({"_id": 100, "watched": [41, 42, 2], "lists_updated_at": changed_at})
+    touched = model.update(batch_size=5)
+
+    fresh = CooccurrenceModel()
+    fresh.build()
+    assert _counts_by_movie(model) == _counts_by_movie(fresh)
+
+    # Same neighbours, scores and order, although the two models number their columns differently
+    assert _all_neighbors(model) == _all_neighbors(fresh)
+    touched_ids = {model.movie_ids[column] for column in touched}
+    assert {1, 2, 5, 41, 42} <= touched_ids
+
+
+def test_neighbors_ordered_by_score_then_movie_id(monkeypatch):
+    # One user per batch, so movie 30 gets a column before movie 20
+    monkeypatch.setattr(cooccurrence, "user_collection", FakeUsers([
+        {"_id": 1, "watched": [1, 30]},
+        {"_id": 2, "watched": [1, 20]},
+        {"_id": 3, "watched": [1, 7, 8], "watch_list": [9]},
+        {"_id": 4, "watched": [7, 8]},
+    ]))
+    model = CooccurrenceModel()
+    model.build(batch_size=1)
+    neighbors = _all_neighbors(model)
+
+    # 20 and 30 tie, as do 7 and 8; 9 is below min_count (one watch_list entry weighs 0.5)
+    assert [neighbor["id"] for neighbor in neighbors[1]] == [20, 30, 7, 8]
+    assert neighbors[1][0]["score"] == neighbors[1][1]["score"] > neighbors[1][2]["score"]
+    assert [neighbor["id"] for neighbor in neighbors[7]] == [8, 1]
+    assert dict(model.neighbors([model.movie_index[1]], top_k=2, min_count=1))[1] == neighbors[1][:2]
+    assert dict(model.neighbors([model.movie_index[1]], min_count=2))[1] == []
@@ -0,0 +1,94 @@
+import io
+import json
+import pytest
+from app.importer import iter_json_values, iter_import_rows, _normalize_row
+
+MOVIES = [
+    {"tmdb_id": 603, "title": "The Matrix", "year": 1999},
+    {"title": "Heat, [1995] {director's cut}", "year": "1995"},
+    {"movie": {"title": "Alien", "year": 1979, "ids": {"tmdb": 348, "imdb": "tt0078748"}}},
+]
+
+
+# --------------------- iter_json_values --------------------- #
+@pytest.mark.parametrize("text", [
+    json.dumps(MOVIES),
+    json.dumps(MOVIES, indent=2),
+    "\n".join(json.dumps(movie) for movie in MOVIES) + "\n",
+    "\r\n".join(json.dumps(movie) for movie in MOVIES),
+])
+def test_iter_json_values_array_and_json_lines(text):
+    # Three characters at a time splits every object, string and nested array across chunks
+    assert list(iter_json_values(io.StringIO(text), chunk_size=3)) == MOVIES
+    assert list(iter_json_values(io.StringIO(text))) == MOVIES
+
+
+def test_iter_json_values_empty_input():
+    assert list(iter_json_values(io.StringIO(""), chunk_size=3)) == []
+    assert list(iter_json_values(io.StringIO("[]"), chunk_size=3)) == []
+    assert list(iter_json_values(io.StringIO(" [ \n ] \n"), chunk_size=3)) == []
+
+
+@pytest.mark.parametrize("text", ['[{"title": "Heat"', '{"title": "Heat"}\n{"title": oops}'])
+def test_iter_json_values_rejects_broken_json(text):
+    with pytest.raises(ValueError):
+        list(iter_json_values(io.StringIO(text), chunk_size=3))
+
+
+# --------------------- _normalize_row --------------------- #
+@pytest.mark.parametrize("row, expected", [
+    ({"tmdb_id": 603, "title": "The Matrix", "year": 1999}, {"tmdb_id": 603, "title": "The Matrix", "year": 1999}),
+    # Letterboxd
+    ({"Name": " Heat ", "Year": "1995", "Letterboxd URI": "https://boxd.it/2a"}, {"tmdb_id": None, "title": "Heat", "year": 1995}),
+    # IMDb-style release date and a string id
+    ({"TMDB ID": "", "tmdbID": "949", "Original Title": "Heat", "Release Date": "1995-12-15"},
+     {"tmdb_id": 949, "title": "Heat", "year": 1995}),
+    # Trakt nests the movie and its ids
+    ({"watched_at": "2020-01-01", "movie": {"title": "Alien", "year": 1979, "ids": {"tmdb": 348, "imdb": "tt0078748"}}},
+     {"tmdb_id": 348, "title": "Alien", "year": 1979}),
+    ({"movie": {"title": "Alien", "ids": {"imdb": "tt0078748"}}}, {"tmdb_id": None, "title": "Alien", "year": None}),
+    ({"movie": {"ids": None}, "title": "Outer"}, None),
+    ({"id": "abc", "year": 1999}, None),
+    ({"rating": 5}, None),
+])
+def test_normalize_row(row, expected):
+    assert _normalize_row(row) == expected
+
+
+# --------------------- iter_import_rows --------------------- #
+def _rows(data, filename):
+    return list(iter_import_rows(io.BytesIO(data.encode("utf-8")), filename))
+
+
+def test_iter_import_rows_csv_with_bom():
+    # Excel writes a BOM, which must not end up in the first column's name
+    data = "\ufeffName,Year,tmdbID\r\nHeat,1995,949\r\n,,\r\n\"Crouching Tiger, Hidden Dragon\",2000,\r\n"
+    assert _rows(data, "letterboxd.csv") == [
+        {"tmdb_id": 949, "title": "Heat", "year": 1995},
+        {"tmdb_id": None, "title": "Crouching Tiger, Hidden Dragon", "year": 2000},
+    ]
+
+
+@pytest.mark.parametrize("filename", ["export.json", "export.JSONL", "export.ndjson"])
+def test_iter_import_rows_json(filename):
+    data = json.dumps(MOVIES) if filename == "export.json" else "\n".join(json.dumps(movie) for movie in MOVIES)
+    assert _rows("\ufeff" + data, filename) == [
+        {"tmdb_id": 603, "title": "The Matrix", "year": 1999},
+        {"tmdb_id": None, "title": "Heat, [1995] {director's cut}", "year": 1995},
+        {"tmdb_id": 348, "title": "Alien", "year": 1979},
+    ]
+
+
+def test_iter_import_rows_skips_values_that_are_not_movies():
+    assert _rows('[1, "Heat", null, {"rating": 5}, {"id": 2}]', "export.json") == [
+        {"tmdb_id": 2, "title": None, "year": None}
+    ]
+
+
+@pytest.mark.parametrize("data", [
+    json.dumps({"movies": MOVIES}),
+    json.dumps({"user": "ann", "watchlist": MOVIES}),
+])
+def test_iter_import_rows_rejects_wrapped_export(data):
+    with pytest.raises(ValueError, match="list of movies"):
+        _rows(data, "export.json")
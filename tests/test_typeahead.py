@@ -0,0 +1,115 @@
+import os
+import pytest
+from app.typeahead import TypeaheadIndex
+
+
+def normalize(text):
+    return " ".join((text or "").casefold().split())
+
+
+class FakeCatalog:
+    """Loader with the contract of helper_functions._load_typeahead_movies"""
+
+    def __init__(self, movies):
+        self.movies = movies
+        self.calls = []
+
+    def __call__(self, after_id, limit):
+        self.calls.append((after_id, limit))
+        if after_id is None:
+            top = sorted(self.movies, key=lambda movie: movie["vote_count"], reverse=True)[:limit]
+            return [*top, {"_id": max(movie["_id"] for movie in self.movies)}]
+        return iter(sorted((movie for movie in self.movies if movie["_id"] > after_id), key=lambda movie: movie["_id"]))
+
+    def add(self, movie_id, title, votes, **fields):
+        self.movies.append({"_id": len(self.movies) + 1, "id": movie_id, "title": title, "vote_count": votes, **fields})
+
+
+@pytest.fixture
+def catalog():
+    catalog = FakeCatalog([])
+    catalog.add(603, "The Matrix", 25000, release_date="1999-03-31")
+    catalog.add(604, "The Matrix Reloaded", 11000)
+    catalog.add(605, "The Matrix Revolutions", 9000)
+    catalog.add(11, "Star Wars", 20000)
+    catalog.add(1891, "The Empire Strikes Back", 17000)
+    catalog.add(194, "Le Fabuleux Destin d'Amélie Poulain", 10000, original_title="Amélie")
+    catalog.add(949, "Heat", 7000)
+    catalog.add(8587, "The Lion King", 18000)
+    catalog.add(1, "A Movie With A Very Long Title Indeed", 50)
+    return catalog
+
+
+def _built(catalog, **settings):
+    index = TypeaheadIndex(catalog, normalize, **settings)
+    index.rebuild()
+    # Built by hand: keep suggest() from starting the background thread
+    index._pid = os.getpid()
+    return index
+
+
+def _ids(suggestions):
+    return [suggestion["id"] for suggestion in suggestions]
+
+
+def test_prefix_matches_any_of_the_first_words(catalog):
+    index = _built(catalog)
+    assert _ids(index.suggest("matri")) == [603, 604, 605]
+    assert _ids(index.suggest("reloa")) == [604]
+    assert _ids(index.suggest("empire strikes")) == [1891]
+    assert _ids(index.suggest("strikes back")) == [1891]
+    # Only the first max_words positions are indexed
+    assert _ids(index.suggest("with a very")) == [1]
+    assert _ids(index.suggest("very long")) == []
+
+
+def test_prefix_matches_original_title(catalog):
+    index = _built(catalog)
+    assert _ids(index.suggest("Amélie")) == [194]
+    assert _ids(index.suggest("fabuleux")) == [194]
+    assert index.suggest("fabuleux")[0]["title"] == "Le Fabuleux Destin d'Amélie Poulain"
+
+
+def test_suggestion_fields_and_limit(catalog):
+    index = _built(catalog)
+    assert index.suggest("The Matrix", limit=1) == [
+        {"id": 603, "title": "The Matrix", "year": "1999", "poster_url": None, "votes": 25000}
+    ]
+    assert index.suggest("   ") == []
+    assert index.stats()["movies"] == len(catalog.movies)
+
+
+@pytest.mark.parametrize("prefix", ["t", "th", "the", "the ", "m", "ma", "mat", "matr", "s", "he"])
+def test_short_prefix_lists_agree_with_bisect(catalog, prefix):
+    index = _built(catalog)
+    # short_prefix=0 answers every prefix from the sorted entries instead of the top-k lists
+    scanned = _built(catalog, short_prefix=0)
+    assert len(normalize(prefix)) <= index.short_prefix
+    assert _ids(index.suggest(prefix, limit=5)) == _ids(scanned.suggest(prefix, limit=5))
+
+
+def test_short_prefix_keeps_only_top_k(catalog):
+    index = _built(catalog, top_k=2)
+    assert _ids(index.suggest("the", limit=10)) == [603, 8587]
+    assert _ids(index.suggest("the matrix", limit=10)) == [603, 604, 605]
+
+
+def test_update_merges_new_movies_without_duplicates(catalog):
+    index = _built(catalog)
+    entries = index.stats()["keys"]
+
+    catalog.add(624860, "The Matrix Resurrections", 5000)
+    catalog.add(11, "Star Wars", 20000)  # same movie inserted again, e.g. by a re-import
+    index.update()
+
+    assert catalog.calls[-1] == (len(catalog.movies) - 2, None)
+    assert _ids(index.suggest("matri")) == [603, 604, 605, 624860]
+    assert _ids(index.suggest("resurrec")) == [624860]
+    assert _ids(index.suggest("star wars")) == [11]
+    assert index.stats() == {"movies": len(catalog.movies) - 1, "keys": entries + 3}
+
+    # Nothing new: the snapshot is left exactly as it is
+    snapshot = index._snapshot
+    index.update()
+    assert index._snapshot is snapshot
+    assert catalog.calls[-1] == (len(catalog.movies), None)
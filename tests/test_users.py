@@ -0,0 +1,177 @@
+from datetime import datetime
+import pytest
+from pymongo import ReturnDocument
+from app import users
+from app.users import apply_list_changes, parse_list_changes, LIST_BATCH_MAX_IDS
+
+MISSING = object()
+NOW = datetime(2024, 1, 1)
+
+
+# --------------------- Pipeline evaluation --------------------- #
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return MISSING
+        doc = doc[part]
+    return doc
+
+
+def _set(doc, path, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    if value is MISSING:
+        doc.pop(last, None)
+    else:
+        doc[last] = value
+
+
+OPERATORS = {
+    "$ifNull": lambda args: next((arg for arg in args if arg not in (None, MISSING)), args[-1]),
+    "$concatArrays": lambda args: [item for arg in args for item in arg],
+    "$size": lambda arg: len(arg),
+    "$not": lambda args: not args[0],
+    "$in": lambda args: args[0] in args[1],
+    "$eq": lambda args: args[0] == args[1],
+    "$and": lambda args: all(args),
+    "$add": lambda args: sum(args),
+    "$cond": lambda args: args[1] if args[0] else args[2],
+}
+
+
+def _evaluate(expr, doc, variables):
+    """The subset of aggregation expressions the list pipelines use"""
+    if isinstance(expr, str) and expr.startswith("$$"):
+        return variables[expr[2:]]
+    if isinstance(expr, str) and expr.startswith("$"):
+        return _get(doc, expr[1:])
+    if isinstance(expr, list):
+        return [_evaluate(item, doc, variables) for item in expr]
+    if isinstance(expr, dict) and len(expr) == 1 and next(iter(expr)).startswith("$"):
+        (operator, argument), = expr.items()
+        if operator == "$literal":
+            return argument
+        if operator == "$filter":
+            return [
+                item for item in _evaluate(argument["input"], doc, variables)
+                if _evaluate(argument["cond"], doc, {**variables, "this": item})
+            ]
+        return OPERATORS[operator](_evaluate(argument, doc, variables))
+    if isinstance(expr, dict):
+        return {key: _evaluate(value, doc, variables) for key, value in expr.items()}
+    return expr
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = {doc["username"]: doc for doc in docs}
+        self.pipelines = []
+
+    def find_one_and_update(self, query, pipeline, projection, return_document):
+        self.pipelines.append(pipeline)
+        doc = self.docs.get(query["username"])
+        if doc is None:
+            return None
+        before = {**doc}
+        for stage in pipeline:
+            if "$set" in stage:
+                values = {path: _evaluate(value, doc, {"NOW": NOW}) for path, value in stage["$set"].items()}
+                for path, value in values.items():
+                    _set(doc, path, value)
+            else:
+                for path in stage["$unset"]:
+                    _set(doc, path, MISSING)
+        result = doc if return_document == ReturnDocument.AFTER else before
+        return {key: result[key] for key, shown in projection.items() if shown and key in result}
+
+
+@pytest.fixture
+def user_collection(monkeypatch):
+    collection = FakeUsers([{
+        "username": "ann", "watch_list": [1, 2, 3], "watched": [9],
+        "list_versions": {"watch_list": 4, "watched": 2}
+    }])
+    monkeypatch.setattr(users, "user_collection", collection)
+    return collection
+
+
+# --------------------- parse_list_changes --------------------- #
+def test_parse_list_changes():
+    add, remove = parse_list_changes({"watch_list": {"add": [1, "2"]}, "watched": {"remove": [3.0]}})
+    assert add == {"watch_list": [1, 2], "watched": []}
+    assert remove == {"watch_list": [], "watched": [3]}
+
+
+@pytest.mark.parametrize("movie_id", [True, False, 0, -5, 2.5, "abc", "", None, [1], {"id": 1}, float("inf"), 2 ** 63])
+def test_parse_list_changes_rejects_non_ids(movie_id):
+    with pytest.raises(ValueError):
+        parse_list_changes({"watched": {"add": [1, movie_id]}})
+
+
+@pytest.mark.parametrize("data", [
+    None, [], {}, {"favorites": {"add": [1]}}, {"watched": [1]},
+    {"watched": {"add": [1], "move": [2]}}, {"watched": {"add": 1}},
+])
+def test_parse_list_changes_rejects_malformed_bodies(data):
+    with pytest.raises(ValueError):
+        parse_list_changes(data)
+
+
+def test_parse_list_changes_caps_ids_over_all_lists():
+    half = LIST_BATCH_MAX_IDS // 2
+    parse_list_changes({"watch_list": {"add": list(range(1, half + 1))}, "watched": {"remove": list(range(1, half + 1))}})
+    with pytest.raises(ValueError):
+        parse_list_changes({"watch_list": {"add": list(range(1, half + 2))}, "watched": {"remove": list(range(1, half + 1))}})
+
+
+# --------------------- apply_list_changes --------------------- #
+def test_apply_list_changes_keeps_order_and_appends(user_collection):
+    apply_list_changes("ann", add={"watch_list": [5, 2, 5, 4]}, remove={"watch_list": [1]})
+    doc = user_collection.docs["ann"]
+    assert doc["watch_list"] == [2, 3, 5, 4]
+    assert doc["counts"] == {"watch_list": 4, "watched": 1}
+    assert doc["list_versions"] == {"watch_list": 5, "watched": 2}
+    assert doc["lists_updated_at"] == NOW
+    assert not any(key.startswith("_next_") for key in doc)
+
+
+def test_apply_list_changes_watched_leaves_watch_list(user_collection):
+    counts = apply_list_changes("ann", add={"watched": [2, 7], "watch_list": [7, 8]})
+    doc = user_collection.docs["ann"]
+    assert doc["watched"] == [9, 2, 7]
+    assert doc["watch_list"] == [1, 3, 8]
+    assert counts == {"counts": {"watch_list": 3, "watched": 3}}
+
+
+def test_apply_list_changes_without_effect_keeps_versions(user_collection):
+    apply_list_changes("ann", add={"watch_list": [1]}, remove={"watched": [42]})
+    doc = user_collection.docs["ann"]
+    assert doc["watch_list"] == [1, 2, 3]
+    assert doc["list_versions"] == {"watch_list": 4, "watched": 2}
+    assert "lists_updated_at" not in doc
+
+
+def _literals(expr):
+    if isinstance(expr, dict):
+        if "$literal" in expr:
+            return [expr["$literal"]]
+        return [literal for value in expr.values() for literal in _literals(value)]
+    if isinstance(expr, list):
+        return [literal for item in expr for literal in _literals(item)]
+    return []
+
+
+def test_apply_list_changes_sends_ids_as_literals(user_collection):
+    apply_list_changes("ann", add={"watched": [7]}, remove={"watch_list": [3]})
+    # Client ids must never reach the server as expressions or field paths
+    assert sorted(_literals(user_collection.pipelines[0])) == [[3, 7], [7]]
+
+
+def test_apply_list_changes_before_and_missing_user(user_collection):
+    before = apply_list_changes(
+        "ann", remove={"watched": [9]}, projection={"watched": 1}, return_document=ReturnDocument.BEFORE
+    )
+    assert before == {"watched": [9]}
+    assert user_collection.docs["ann"]["watched"] == []
+    assert apply_list_changes("bob", add={"watched": [1]}) is None
@@ -0,0 +1,4 @@
+from app.notifications import run_notification_worker
+
+if __name__ == "__main__":
+    run_notification_worker()